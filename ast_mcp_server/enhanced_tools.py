@@ -8,39 +8,106 @@ optimizations for handling large codebases.
 
 from typing import Dict, List, Optional, Union, Any, Set, Tuple
 import os
+import sys
 import json
-from tree_sitter import Language, Parser, Node, Tree, TreeCursor
-from collections import defaultdict
+import gc
+import hashlib
+import mmap
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from bisect import bisect_left
+from itertools import accumulate
+from tree_sitter import Language, Node, Tree, TreeCursor, QueryCursor
+from collections import OrderedDict
 
 from .tools import (
-    PARSERS_DIR, LANGUAGES_LIB, LANGUAGE_MAP, 
-    detect_language, node_to_dict, parser, languages,
-    init_parsers
+    PARSERS_DIR, node_to_dict, languages, init_parsers, get_query,
+    edit_tree, get_parser, resolve_language, _source_bytes
 )
+from .resources import atomic_write
+
+# orjson is optional; when installed, cached ASGs are (de)serialized with it
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Numba is optional; when installed, the position lookup loop is JIT-compiled
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# LRU cache of parsed trees keyed by (language, source digest), so repeated
+# parses of the same source reuse the tree instead of parsing again. Parses
+# may run on several threads (see diff_ast_parallel), so the cache is locked;
+# each thread parses with its own parser from get_parser.
+TREE_CACHE_SIZE = 128
+_tree_cache: "OrderedDict[Tuple[str, bytes], Tree]" = OrderedDict()
+_tree_cache_lock = threading.Lock()
+
+# Position indexes built for find_node_at_position, keyed like the tree cache
+POSITION_INDEX_CACHE_SIZE = 32
+_position_index_cache: "OrderedDict[Tuple[str, bytes], Dict]" = OrderedDict()
 
 # Types of control flow nodes in Python
-PYTHON_CONTROL_FLOW_NODES = {
+PYTHON_CONTROL_FLOW_NODES = frozenset({
     "if_statement", "for_statement", "while_statement", 
     "try_statement", "with_statement", "match_statement"
-}
+})
 
 # Types of nodes that create new scopes in Python
-PYTHON_SCOPE_NODES = {
+PYTHON_SCOPE_NODES = frozenset({
     "function_definition", "class_definition",
     "for_statement", "while_statement", "with_statement"
-}
+})
+
+# Edge kinds produced by the language-specific semantic passes, as opposed
+# to the structural "contains" edges
+SEMANTIC_EDGE_KINDS = frozenset({
+    "control_flow", "calls", "calls_import", "references"
+})
+
+# Interior node types whose source text is still copied into ASG nodes; all
+# other interior nodes leave it out, since clients can slice the source by
+# start_byte/end_byte and the text of large blocks is repeated up the tree
+ASG_TEXT_NODE_TYPES = frozenset({
+    "identifier", "string", "integer", "float"
+})
+
+# Tree-sitter query matching the Python definitions recorded in the scope
+# manager: function and class names, parameters, assigned names and imports
+PYTHON_DEFINITIONS_QUERY = """
+(function_definition name: (identifier) @function)
+(function_definition parameters: (parameters (identifier) @variable))
+(class_definition name: (identifier) @class)
+(assignment left: (identifier) @variable right: (_))
+(import_statement [(dotted_name) (identifier)] @import)
+(import_from_statement [(dotted_name) (identifier)] @import)
+"""
 
 class ScopeManager:
     """Manages scope hierarchy for semantic analysis."""
     
+    __slots__ = (
+        "scopes", "scope_chains", "variables", "functions", "classes",
+        "imports", "global_scope", "control_flow", "control_flow_top"
+    )
+    
     def __init__(self):
         self.scopes = {}  # Maps scope_id to parent_scope_id
-        self.variables = defaultdict(dict)  # Maps scope_id -> {var_name: var_id}
+        self.scope_chains = {}  # Maps scope_id to (scope_id, parent, ..., outermost)
+        self.variables = {}  # Maps (scope_id, var_name) to var_id
         self.functions = {}  # Maps func_name to func_id
         self.classes = {}    # Maps class_name to class_id
         self.imports = {}    # Maps import_name to import_id
         self.global_scope = "global"
-        self.control_flow = []  # Stack of control flow nodes
+        self.control_flow = [None] * 64  # Stack of control flow nodes, grown by doubling
+        self.control_flow_top = 0  # Number of entries in use on the stack
         
     def enter_scope(self, scope_id: str, parent_scope_id: Optional[str] = None) -> str:
         """
@@ -56,7 +123,11 @@ class ScopeManager:
         if parent_scope_id is None:
             parent_scope_id = self.global_scope
             
+        scope_chains = self.scope_chains
         self.scopes[scope_id] = parent_scope_id
+        scope_chains[scope_id] = (scope_id,) + scope_chains.get(
+            parent_scope_id, (parent_scope_id,)
+        )
         return scope_id
     
     def get_parent_scope(self, scope_id: str) -> Optional[str]:
@@ -65,7 +136,7 @@ class ScopeManager:
     
     def add_variable(self, var_name: str, var_id: str, scope_id: str) -> None:
         """Add a variable to the current scope."""
-        self.variables[scope_id][var_name] = var_id
+        self.variables[(scope_id, var_name)] = var_id
     
     def add_function(self, func_name: str, func_id: str) -> None:
         """Add a function definition."""
@@ -91,14 +162,13 @@ class ScopeManager:
         Returns:
             The variable ID if found, None otherwise
         """
-        current_scope = scope_id
+        variables = self.variables
         
-        while current_scope is not None:
-            if var_name in self.variables[current_scope]:
-                return self.variables[current_scope][var_name]
-            
-            # Move up to parent scope
-            current_scope = self.get_parent_scope(current_scope)
+        # The chain lists the scope and its ancestors, innermost first
+        for current_scope in self.scope_chains.get(scope_id, (scope_id,)):
+            var_id = variables.get((current_scope, var_name))
+            if var_id is not None:
+                return var_id
         
         return None
     
@@ -116,27 +186,86 @@ class ScopeManager:
     
     def enter_control_flow(self, node_id: str) -> None:
         """Push a control flow node onto the stack."""
-        self.control_flow.append(node_id)
+        top = self.control_flow_top
+        if top == len(self.control_flow):
+            self.control_flow.extend([None] * top)
+        self.control_flow[top] = node_id
+        self.control_flow_top = top + 1
     
     def exit_control_flow(self) -> Optional[str]:
         """Pop a control flow node from the stack."""
-        if self.control_flow:
-            return self.control_flow.pop()
+        if self.control_flow_top:
+            self.control_flow_top -= 1
+            return self.control_flow[self.control_flow_top]
         return None
     
     def get_current_control_flow(self) -> Optional[str]:
         """Get the current control flow node."""
-        if self.control_flow:
-            return self.control_flow[-1]
+        if self.control_flow_top:
+            return self.control_flow[self.control_flow_top - 1]
         return None
 
 
+@contextmanager
+def _gc_paused():
+    """
+    Suspend the cyclic garbage collector while building node and edge dicts.
+    
+    AST and ASG construction allocates one small dict per node and edge and
+    frees none of them, so the collections it would trigger find no garbage.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _tree_cache_key(language: str, source_bytes: bytes) -> Tuple[str, bytes]:
+    """Build the tree cache key for a piece of source code."""
+    return (language, hashlib.blake2b(source_bytes, digest_size=16).digest())
+
+
+def get_cached_tree(source_bytes: bytes, language: str) -> Optional[Tree]:
+    """Return the cached tree for this source, or None if it was not parsed recently."""
+    key = _tree_cache_key(language, source_bytes)
+    with _tree_cache_lock:
+        tree = _tree_cache.get(key)
+        if tree is not None:
+            _tree_cache.move_to_end(key)
+    return tree
+
+
+def _parse_only(source_bytes: bytes, language: str) -> Tree:
+    """Parse source into a tree without building the dict AST, going through the tree cache."""
+    cache_key = _tree_cache_key(language, source_bytes)
+    with _tree_cache_lock:
+        tree = _tree_cache.get(cache_key)
+        if tree is not None:
+            _tree_cache.move_to_end(cache_key)
+            return tree
+    
+    tree = get_parser(language).parse(source_bytes)
+    _remember_tree(cache_key, tree)
+    return tree
+
+
+def _remember_tree(cache_key: Tuple[str, bytes], tree: Tree) -> None:
+    """Put a parsed tree into the tree cache, evicting the least recently used one."""
+    with _tree_cache_lock:
+        _tree_cache[cache_key] = tree
+        if len(_tree_cache) > TREE_CACHE_SIZE:
+            _tree_cache.popitem(last=False)
+
+
 def parse_code_to_ast_incremental(
-    code: str, 
+    code: Union[str, bytes], 
     language: Optional[str] = None,
     filename: Optional[str] = None,
     previous_tree: Optional[Tree] = None,
-    old_code: Optional[str] = None,
+    old_code: Optional[Union[str, bytes]] = None,
     include_children: bool = True
 ) -> Dict:
     """
@@ -147,7 +276,7 @@ def parse_code_to_ast_incremental(
     for large files with small changes.
     
     Args:
-        code: Source code to parse
+        code: Source code to parse, as text or UTF-8 bytes
         language: Programming language identifier (optional)
         filename: Source file name (optional, used for language detection)
         previous_tree: Previously parsed tree (optional, for incremental parsing)
@@ -162,31 +291,33 @@ def parse_code_to_ast_incremental(
     if not languages and not init_parsers():
         return {"error": "Tree-sitter language parsers not available. Run build_parsers.py first."}
     
-    # Detect language if not provided
-    if not language:
-        language = detect_language(code, filename)
-    
-    # Normalize language identifier
-    language = LANGUAGE_MAP.get(language.lower(), language.lower())
+    # Detect and normalize the language identifier
+    language = resolve_language(code, language, filename)
     
     # Check if language is supported
     if language not in languages:
         return {"error": f"Unsupported language: {language}"}
     
     try:
-        # Set the parser language
-        parser.set_language(languages[language])
+        source_bytes = _source_bytes(code)
         
-        # Parse the code, potentially incrementally
-        source_bytes = bytes(code, 'utf-8')
+        # Parse the code, potentially incrementally, reusing the tree if this
+        # exact source was parsed recently
+        if previous_tree and old_code:
+            # Edit a copy, since the previous tree may also be in the tree cache
+            old_tree = previous_tree.copy()
+            edit_tree(old_tree, _source_bytes(old_code), source_bytes)
+            tree = get_cached_tree(source_bytes, language)
+            if tree is None:
+                tree = get_parser(language).parse(source_bytes, old_tree)
+                _remember_tree(_tree_cache_key(language, source_bytes), tree)
+        else:
+            tree = _parse_only(source_bytes, language)
         
         if previous_tree and old_code:
-            old_source_bytes = bytes(old_code, 'utf-8')
-            tree = parser.parse(source_bytes, previous_tree)
-            
             # Calculate which nodes changed
             changed_ranges = []
-            for edit in tree.get_changed_ranges(previous_tree):
+            for edit in old_tree.changed_ranges(tree):
                 changed_ranges.append({
                     "start_byte": edit.start_byte,
                     "end_byte": edit.end_byte,
@@ -194,12 +325,14 @@ def parse_code_to_ast_incremental(
                     "end_point": {"row": edit.end_point[0], "column": edit.end_point[1]}
                 })
         else:
-            tree = parser.parse(source_bytes)
             changed_ranges = None  # No previous tree to compare with
         
         # Convert to dictionary
         root_node = tree.root_node
-        ast = node_to_dict(root_node, source_bytes, include_children)
+        with _gc_paused():
+            # Keep node text: the dict-AST fallback of the enhanced ASG reads
+            # names from it
+            ast = node_to_dict(root_node, source_bytes, include_children, include_text=True)
         
         result = {
             "language": language,
@@ -216,7 +349,30 @@ def parse_code_to_ast_incremental(
         return {"error": f"Error parsing code: {e}"}
 
 
-def create_enhanced_asg_from_ast(ast_data: Dict) -> Dict:
+def _nid(node: Dict) -> Tuple[str, int, int]:
+    """Return the internal (type, start_byte, end_byte) key of a dict AST node."""
+    return (node["type"], node["start_byte"], node["end_byte"])
+
+
+def _edges_to_dicts(
+    edges: List[Tuple],
+    id_strings: Dict[Tuple, str],
+    edge_kinds: Optional[Set[str]] = None
+) -> List[Dict]:
+    """Convert (source_key, target_key, type) edge tuples to serializable dicts, keeping only edge_kinds if given."""
+    return [
+        {"source": id_strings[source], "target": id_strings[target], "type": edge_type}
+        for source, target, edge_type in edges
+        if edge_kinds is None or edge_type in edge_kinds
+    ]
+
+
+def _wants_semantic_edges(edge_kinds: Optional[Set[str]]) -> bool:
+    """Check whether any edge kind produced by the semantic passes was requested."""
+    return edge_kinds is None or not SEMANTIC_EDGE_KINDS.isdisjoint(edge_kinds)
+
+
+def create_enhanced_asg_from_ast(ast_data: Dict, edge_kinds: Optional[Set[str]] = None) -> Dict:
     """
     Create an enhanced Abstract Semantic Graph (ASG) from an AST.
     
@@ -225,75 +381,311 @@ def create_enhanced_asg_from_ast(ast_data: Dict) -> Dict:
     
     Args:
         ast_data: AST data from parse_code_to_ast
+        edge_kinds: Edge types to include (e.g. {"contains"}); all types if None.
+            The semantic analysis is skipped when none of its edge types
+            are requested.
         
     Returns:
         Dictionary representation of the enhanced ASG
     """
     if "error" in ast_data:
         return ast_data
-    
-    ast = ast_data["ast"]
+
     language = ast_data["language"]
-    
-    # Extract nodes and edges from the AST
+
+    # Walk the native tree directly when we have it; the dict AST is only
+    # needed for results that were loaded without their tree object
+    if ast_data.get("tree_object") is not None:
+        with _gc_paused():
+            return create_enhanced_asg_from_tree(ast_data["tree_object"], language, edge_kinds)
+
+    # ASTs from parse_code_to_ast leave out node text; reparse their source
+    # (usually a tree-cache hit) rather than walking a dict without names
+    if "source" in ast_data and "text" not in ast_data["ast"] and (languages or init_parsers()):
+        if language in languages:
+            tree = _parse_only(_source_bytes(ast_data["source"]), language)
+            with _gc_paused():
+                return create_enhanced_asg_from_tree(tree, language, edge_kinds)
+
+    with _gc_paused():
+        return _create_enhanced_asg_from_dict(ast_data["ast"], language, edge_kinds)
+
+
+def _create_enhanced_asg_from_dict(
+    ast: Dict, language: str, edge_kinds: Optional[Set[str]] = None
+) -> Dict:
+    """Build the enhanced ASG by walking a dict AST (see create_enhanced_asg_from_ast)."""
+    # Extract nodes and edges from the AST. Edges are kept as tuples of node
+    # keys and only turned into id strings once everything is collected.
     nodes = []
     edges = []
     node_ids = {}  # Map of {node_id: node_index} for quick lookups
+    id_strings = {}  # Intern table of {node_key: node_id}
     
-    def extract_nodes(node, parent_id=None):
-        node_id = f"{node['type']}_{node['start_byte']}_{node['end_byte']}"
+    # Walk the AST in pre-order with an explicit stack of (node, parent_key)
+    stack = [(ast, None)]
+    while stack:
+        node, parent_key = stack.pop()
+        node_key = _nid(node)
+        node_id = id_strings.get(node_key)
+        if node_id is None:
+            node_id = id_strings[node_key] = f"{node_key[0]}_{node_key[1]}_{node_key[2]}"
         
         # Create a node object with metadata
-        node_index = len(nodes)
-        node_obj = {
+        node_ids[node_id] = len(nodes)
+        nodes.append({
             "id": node_id,
             "type": node["type"],
-            "text": node["text"],
+            "text": node["text"] if not node.get("children") or node["type"] in ASG_TEXT_NODE_TYPES else None,
             "start_byte": node["start_byte"],
             "end_byte": node["end_byte"],
             "start_line": node["start_point"]["row"],
             "start_col": node["start_point"]["column"],
             "end_line": node["end_point"]["row"],
             "end_col": node["end_point"]["column"]
-        }
-        nodes.append(node_obj)
-        node_ids[node_id] = node_index
+        })
         
         # Add edge to parent if exists
-        if parent_id:
-            edges.append({
-                "source": parent_id,
-                "target": node_id,
-                "type": "contains"
-            })
-        
-        # Process children
+        if parent_key:
+            edges.append((parent_key, node_key, "contains"))
+        
+        # Push children in reverse so they are visited in order
         if "children" in node:
-            for child in node["children"]:
-                extract_nodes(child, node_id)
-                
-        return node_id
+            stack.extend([(child, node_key) for child in reversed(node["children"])])
     
-    # Start extraction from the root
-    root_id = extract_nodes(ast)
+    root_id = nodes[0]["id"]
     
-    # Add semantic edges based on language-specific rules
-    if language == "python":
-        add_enhanced_python_semantic_edges(ast, edges)
-    elif language in ["javascript", "typescript"]:
-        add_enhanced_js_ts_semantic_edges(ast, edges)
+    # Add semantic edges based on language-specific rules, unless the caller
+    # only asked for structural edges
+    if _wants_semantic_edges(edge_kinds):
+        if language == "python":
+            add_enhanced_python_semantic_edges(ast, edges)
+        elif language in ["javascript", "typescript"]:
+            add_enhanced_js_ts_semantic_edges(ast, edges)
     
     # Add additional metadata to the ASG
     return {
         "language": language,
         "nodes": nodes,
-        "edges": edges,
+        "edges": _edges_to_dicts(edges, id_strings, edge_kinds),
         "root": root_id,
         "node_lookup": node_ids,  # Helps with quick node lookup by ID
     }
 
 
-def add_enhanced_python_semantic_edges(ast: Dict, edges: List[Dict]):
+def _add_python_definitions(tree: Tree, scope_manager: ScopeManager) -> None:
+    """
+    Record the definitions in a Python tree with a single tree-sitter query.
+
+    Matching runs in tree-sitter itself, so Python only sees the captured
+    names. Variables are bound in their nearest enclosing scope node, which
+    is the same scope the tree walk enters for them.
+
+    Args:
+        tree: Parsed Python tree
+        scope_manager: Scope manager to record the definitions in
+    """
+    captures = QueryCursor(get_query("python", PYTHON_DEFINITIONS_QUERY)).captures(tree.root_node)
+    scope_nodes = PYTHON_SCOPE_NODES
+    by_position = lambda node: node.start_byte
+
+    # Later definitions of a name replace earlier ones, so apply each kind
+    # in source order
+    for name_node in sorted(captures.get("function", ()), key=by_position):
+        func = name_node.parent
+        scope_manager.add_function(
+            name_node.text.decode('utf-8'), (func.type, func.start_byte, func.end_byte)
+        )
+
+    for name_node in sorted(captures.get("class", ()), key=by_position):
+        cls = name_node.parent
+        scope_manager.add_class(
+            name_node.text.decode('utf-8'), (cls.type, cls.start_byte, cls.end_byte)
+        )
+
+    for name_node in sorted(captures.get("variable", ()), key=by_position):
+        scope = scope_manager.global_scope
+        ancestor = name_node.parent
+        while ancestor is not None:
+            if ancestor.type in scope_nodes:
+                scope = (ancestor.type, ancestor.start_byte, ancestor.end_byte)
+                break
+            ancestor = ancestor.parent
+        scope_manager.add_variable(
+            name_node.text.decode('utf-8'),
+            ("identifier", name_node.start_byte, name_node.end_byte),
+            scope
+        )
+
+    for name_node in sorted(captures.get("import", ()), key=by_position):
+        scope_manager.add_import(
+            name_node.text.decode('utf-8'),
+            (name_node.type, name_node.start_byte, name_node.end_byte)
+        )
+
+
+def create_enhanced_asg_from_tree(
+    tree: Tree, language: str, edge_kinds: Optional[Set[str]] = None
+) -> Dict:
+    """
+    Create an enhanced ASG in a single pass over a tree-sitter Tree.
+
+    Nodes, containment edges, scopes and control flow edges are all collected
+    during one iterative TreeCursor walk, while definitions come from a
+    tree-sitter query run up front. Reference sites are queued during the
+    walk and resolved once every definition is known, so the result matches
+    the two-pass analysis over the dict AST.
+
+    Args:
+        tree: Tree produced by parse_code_to_ast_incremental
+        language: Normalized language identifier
+        edge_kinds: Edge types to include; all types if None
+
+    Returns:
+        Dictionary representation of the enhanced ASG
+    """
+    nodes = []
+    contains_edges = []
+    control_flow_edges = []
+    node_ids = {}
+    id_strings = {}
+
+    analyze_python = language == "python" and _wants_semantic_edges(edge_kinds)
+    want_contains = edge_kinds is None or "contains" in edge_kinds
+    scope_manager = ScopeManager()
+    current_scope = scope_manager.global_scope
+    # Local aliases keep the per-node membership tests off global lookups
+    scope_nodes = PYTHON_SCOPE_NODES
+    control_flow_nodes = PYTHON_CONTROL_FLOW_NODES
+    text_node_types = ASG_TEXT_NODE_TYPES
+
+    # (kind, source_key, name, scope) tuples resolved after the walk
+    pending_references = []
+
+    if analyze_python:
+        _add_python_definitions(tree, scope_manager)
+
+    # Interned node type names by kind id, as in node_to_all
+    type_names = {}
+
+    # Path from the root to the current node: (node_key, outer_scope)
+    path = []
+    cursor = tree.walk()
+
+    while True:
+        node = cursor.node
+        kind_id = node.kind_id
+        node_type = type_names.get(kind_id)
+        if node_type is None:
+            node_type = type_names[kind_id] = sys.intern(node.type)
+        node_key = (node_type, node.start_byte, node.end_byte)
+        node_id = id_strings.get(node_key)
+        if node_id is None:
+            node_id = id_strings[node_key] = f"{node_type}_{node_key[1]}_{node_key[2]}"
+
+        node_ids[node_id] = len(nodes)
+        nodes.append({
+            "id": node_id,
+            "type": node_type,
+            "text": node.text.decode('utf-8') if node.child_count == 0 or node_type in text_node_types else None,
+            "start_byte": node.start_byte,
+            "end_byte": node.end_byte,
+            "start_line": node.start_point[0],
+            "start_col": node.start_point[1],
+            "end_line": node.end_point[0],
+            "end_col": node.end_point[1]
+        })
+
+        if path and want_contains:
+            contains_edges.append((path[-1][0], node_key, "contains"))
+
+        outer_scope = current_scope
+
+        if analyze_python:
+            if node_type in scope_nodes:
+                current_scope = scope_manager.enter_scope(node_key, current_scope)
+
+            if node_type == "call":
+                for child in node.children:
+                    if child.type == "identifier":
+                        pending_references.append((
+                            "calls",
+                            ("identifier", child.start_byte, child.end_byte),
+                            child.text.decode('utf-8'),
+                            None
+                        ))
+                        break
+
+            elif node_type == "identifier":
+                pending_references.append((
+                    "references", node_key, node.text.decode('utf-8'), current_scope
+                ))
+
+            if node_type in control_flow_nodes:
+                scope_manager.enter_control_flow(node_key)
+
+                # Add control flow edge from this node to its body
+                for child in node.children:
+                    if child.type == "block":
+                        control_flow_edges.append((
+                            node_key,
+                            ("block", child.start_byte, child.end_byte),
+                            "control_flow"
+                        ))
+                        break
+
+        path.append((node_key, outer_scope))
+        if cursor.goto_first_child():
+            continue
+
+        # Leave finished nodes until one of them has a next sibling
+        while True:
+            left_key, current_scope = path.pop()
+            if analyze_python and left_key[0] in control_flow_nodes:
+                scope_manager.exit_control_flow()
+            if cursor.goto_next_sibling():
+                break
+            if not cursor.goto_parent():
+                break
+
+        if not path:
+            break
+
+    # Resolve the queued references now that all definitions are known.
+    # No definitions are added from here on, so each (scope, name) pair
+    # only has to be looked up once.
+    semantic_edges = []
+    resolve_cache = {}
+    for kind, source_key, name, scope in pending_references:
+        if kind == "calls":
+            func_key = scope_manager.find_function(name)
+            if func_key:
+                semantic_edges.append((source_key, func_key, "calls"))
+
+            import_key = scope_manager.find_import(name)
+            if import_key:
+                semantic_edges.append((source_key, import_key, "calls_import"))
+        else:
+            lookup = (scope, name)
+            if lookup in resolve_cache:
+                ref_key = resolve_cache[lookup]
+            else:
+                ref_key = resolve_cache[lookup] = scope_manager.find_variable(name, scope)
+            if ref_key and ref_key != source_key:  # Don't link to self
+                semantic_edges.append((source_key, ref_key, "references"))
+
+    return {
+        "language": language,
+        "nodes": nodes,
+        "edges": _edges_to_dicts(
+            contains_edges + control_flow_edges + semantic_edges, id_strings, edge_kinds
+        ),
+        "root": nodes[0]["id"],
+        "node_lookup": node_ids,  # Helps with quick node lookup by ID
+    }
+
+
+def add_enhanced_python_semantic_edges(ast: Dict, edges: List[Tuple]):
     """
     Add enhanced Python-specific semantic edges to the ASG.
     
@@ -304,45 +696,67 @@ def add_enhanced_python_semantic_edges(ast: Dict, edges: List[Dict]):
     
     Args:
         ast: The Python AST
-        edges: List to store the detected edges
+        edges: List to store the detected (source_key, target_key, type) edges
     """
     scope_manager = ScopeManager()
     current_scope = scope_manager.global_scope
+    # Enclosing scope of every node, recorded by the first pass so the
+    # second pass doesn't have to track scopes again
+    node_scope: Dict[tuple, Any] = {}
+    # Local aliases keep the per-node membership tests off global lookups
+    scope_nodes = PYTHON_SCOPE_NODES
+    control_flow_nodes = PYTHON_CONTROL_FLOW_NODES
     
-    # First pass: find all definitions (functions, classes, variables)
-    def find_enhanced_definitions(node, scope=None):
-        nonlocal current_scope
-        old_scope = current_scope
-        node_id = f"{node['type']}_{node['start_byte']}_{node['end_byte']}"
+    # First pass: find all definitions (functions, classes, variables).
+    # Handles one node in the given scope and returns the scope its
+    # children are in.
+    def find_enhanced_definitions(node, current_scope):
+        node_id = _nid(node)
+        children = node.get("children", ())
+        fields = node.get("fields")
         
         # Check for scope-creating nodes
-        if node["type"] in PYTHON_SCOPE_NODES:
+        if node["type"] in scope_nodes:
             # Create new scope for this node
             current_scope = scope_manager.enter_scope(node_id, current_scope)
         
+        node_scope[node_id] = current_scope
+        
         # Check for definitions
-        if node["type"] == "function_definition":
+        if node["type"] == "function_definition" and fields and "name" in fields:
+            # Look the name and parameters up through their fields
+            scope_manager.add_function(children[fields["name"]]["text"], node_id)
+            
+            if "parameters" in fields:
+                for param in children[fields["parameters"]].get("children", ()):
+                    if param["type"] == "identifier":
+                        scope_manager.add_variable(param["text"], _nid(param), current_scope)
+        
+        elif node["type"] == "function_definition":
             # Get function name
-            for child in node.get("children", []):
+            for child in children:
                 if child["type"] == "identifier":
                     func_name = child["text"]
                     func_id = node_id
                     scope_manager.add_function(func_name, func_id)
                     
                     # Add parameters to function scope
-                    for param_child in node.get("children", []):
+                    for param_child in children:
                         if param_child["type"] == "parameters":
-                            for param in param_child.get("children", []):
+                            for param in param_child.get("children", ()):
                                 if param["type"] == "identifier":
                                     param_name = param["text"]
-                                    param_id = f"{param['type']}_{param['start_byte']}_{param['end_byte']}"
+                                    param_id = _nid(param)
                                     scope_manager.add_variable(param_name, param_id, current_scope)
                     
                     break
         
+        elif node["type"] == "class_definition" and fields and "name" in fields:
+            scope_manager.add_class(children[fields["name"]]["text"], node_id)
+        
         elif node["type"] == "class_definition":
             # Get class name
-            for child in node.get("children", []):
+            for child in children:
                 if child["type"] == "identifier":
                     class_name = child["text"]
                     class_id = node_id
@@ -351,113 +765,91 @@ def add_enhanced_python_semantic_edges(ast: Dict, edges: List[Dict]):
         
         elif node["type"] == "assignment":
             # Handle variable assignments
-            # The left side is the target (variable being defined)
-            targets = []
-            values = []
-            
-            # Split children into targets and values
-            for i, child in enumerate(node.get("children", [])):
-                if child["type"] == "=" and i > 0:
-                    # Everything before '=' is a target
-                    targets = node["children"][:i]
-                    # Everything after '=' is a value
-                    values = node["children"][i+1:]
-                    break
+            # Everything before the first '=' is a target (variable being
+            # defined); the value side is not needed here. With field indexes
+            # the target is the "left" child when there is a "right" value.
+            targets = ()
+            if fields is not None:
+                if "left" in fields and "right" in fields:
+                    targets = (children[fields["left"]],)
+            else:
+                for i in range(1, len(children)):
+                    if children[i]["type"] == "=":
+                        targets = children[:i]
+                        break
             
             # Process targets (variables being assigned)
             for target in targets:
                 if target["type"] == "identifier":
                     var_name = target["text"]
-                    var_id = f"{target['type']}_{target['start_byte']}_{target['end_byte']}"
+                    var_id = _nid(target)
                     scope_manager.add_variable(var_name, var_id, current_scope)
                 
                 # Handle tuple unpacking
                 elif target["type"] == "tuple" or target["type"] == "list":
-                    for element in target.get("children", []):
+                    for element in target.get("children", ()):
                         if element["type"] == "identifier":
                             var_name = element["text"]
-                            var_id = f"{element['type']}_{element['start_byte']}_{element['end_byte']}"
+                            var_id = _nid(element)
                             scope_manager.add_variable(var_name, var_id, current_scope)
         
         elif node["type"] == "import_statement" or node["type"] == "import_from_statement":
             # Track imported modules and functions
-            for child in node.get("children", []):
+            for child in children:
                 if child["type"] == "dotted_name" or child["type"] == "identifier":
                     import_name = child["text"]
-                    import_id = f"{child['type']}_{child['start_byte']}_{child['end_byte']}"
+                    import_id = _nid(child)
                     scope_manager.add_import(import_name, import_id)
         
         # Check for control flow nodes
-        if node["type"] in PYTHON_CONTROL_FLOW_NODES:
+        if node["type"] in control_flow_nodes:
             scope_manager.enter_control_flow(node_id)
             
             # Add control flow edges between blocks
             body_node = None
-            for child in node.get("children", []):
+            for child in children:
                 if child["type"] == "block":
                     body_node = child
                     break
             
             if body_node:
                 # Add control flow edge from this node to its body
-                edges.append({
-                    "source": node_id,
-                    "target": f"{body_node['type']}_{body_node['start_byte']}_{body_node['end_byte']}",
-                    "type": "control_flow"
-                })
-        
-        # Process all children recursively
-        for child in node.get("children", []):
-            find_enhanced_definitions(child, current_scope)
-        
-        # Exit any control flow blocks we entered
-        if node["type"] in PYTHON_CONTROL_FLOW_NODES:
-            scope_manager.exit_control_flow()
+                edges.append((node_id, _nid(body_node), "control_flow"))
         
-        # Restore previous scope if we created a new one
-        if node["type"] in PYTHON_SCOPE_NODES:
-            current_scope = old_scope
+        return current_scope
+    
+    # Variable lookups by (scope, name). Every definition is known once the
+    # first pass is done, so cached resolutions never go stale.
+    resolve_cache = {}
     
     # Second pass: find all references and connect the edges
-    def find_enhanced_references(node, scope=None):
-        nonlocal current_scope
-        old_scope = current_scope
-        node_id = f"{node['type']}_{node['start_byte']}_{node['end_byte']}"
-        
-        # Update scope if needed
-        if node["type"] in PYTHON_SCOPE_NODES:
-            current_scope = node_id
+    def find_enhanced_references(node):
+        node_id = _nid(node)
+        children = node.get("children", ())
+        current_scope = node_scope[node_id]
         
         # Look for references to functions, variables, etc.
         if node["type"] == "call":
             # Find the function name (first child is usually the function being called)
             func_node = None
-            for child in node.get("children", []):
+            for child in children:
                 if child["type"] == "identifier":
                     func_node = child
                     break
             
             if func_node:
                 func_name = func_node["text"]
-                caller_id = f"{func_node['type']}_{func_node['start_byte']}_{func_node['end_byte']}"
+                caller_id = _nid(func_node)
                 
                 # Look for the function definition
                 func_id = scope_manager.find_function(func_name)
                 if func_id:
-                    edges.append({
-                        "source": caller_id,
-                        "target": func_id,
-                        "type": "calls"
-                    })
+                    edges.append((caller_id, func_id, "calls"))
                 
                 # Check if it's an imported function
                 import_id = scope_manager.find_import(func_name)
                 if import_id:
-                    edges.append({
-                        "source": caller_id,
-                        "target": import_id,
-                        "type": "calls_import"
-                    })
+                    edges.append((caller_id, import_id, "calls_import"))
         
         elif node["type"] == "identifier":
             # Check if this is a variable reference (not a definition)
@@ -471,28 +863,84 @@ def add_enhanced_python_semantic_edges(ast: Dict, edges: List[Dict]):
                 var_id = node_id
                 
                 # Look for the variable definition
-                ref_id = scope_manager.find_variable(var_name, current_scope)
+                lookup = (current_scope, var_name)
+                if lookup in resolve_cache:
+                    ref_id = resolve_cache[lookup]
+                else:
+                    ref_id = resolve_cache[lookup] = scope_manager.find_variable(var_name, current_scope)
                 if ref_id and ref_id != var_id:  # Don't link to self
-                    edges.append({
-                        "source": var_id,
-                        "target": ref_id,
-                        "type": "references"
-                    })
+                    edges.append((var_id, ref_id, "references"))
         
-        # Process all children recursively
-        for child in node.get("children", []):
-            find_enhanced_references(child, current_scope)
+        return children
+    
+    # Run both passes in pre-order with explicit stacks. In the first pass
+    # every entry carries the scope its node is in, and control flow nodes
+    # are pushed again beneath their children so the control flow block is
+    # exited once the whole subtree has been visited.
+    stack = [(ast, current_scope, False)]
+    while stack:
+        node, scope, leaving = stack.pop()
+        if leaving:
+            scope_manager.exit_control_flow()
+            continue
         
-        # Restore previous scope if we created a new one
-        if node["type"] in PYTHON_SCOPE_NODES:
-            current_scope = old_scope
+        child_scope = find_enhanced_definitions(node, scope)
+        if node["type"] in control_flow_nodes:
+            stack.append((node, None, True))
+        stack.extend([(child, child_scope, False) for child in reversed(node.get("children", ()))])
+    
+    stack = [ast]
+    while stack:
+        children = find_enhanced_references(stack.pop())
+        stack.extend(reversed(children))
+
+
+def save_enhanced_asg(asg_data: Dict, cache_path: str) -> None:
+    """
+    Write an enhanced ASG to a JSON cache file.
     
-    # Run both passes
-    find_enhanced_definitions(ast)
-    find_enhanced_references(ast)
+    Enhanced ASGs carry a dict per node and per edge, so for large files the
+    stdlib encoder dominates the cost of caching them. orjson is used when
+    it is installed, writing the same JSON in a single call.
+    
+    Args:
+        asg_data: The enhanced ASG data
+        cache_path: Path of the cache file to write
+    """
+    if ORJSON_AVAILABLE:
+        with atomic_write(cache_path) as f:
+            f.write(orjson.dumps(asg_data))
+    else:
+        with atomic_write(cache_path, 'w') as f:
+            json.dump(asg_data, f)
 
 
-def add_enhanced_js_ts_semantic_edges(ast: Dict, edges: List[Dict]):
+def load_enhanced_asg(cache_path: str) -> Dict:
+    """
+    Read an enhanced ASG from a JSON cache file written by save_enhanced_asg.
+    
+    With orjson, the file is memory-mapped and parsed in place rather than
+    first copied into a bytes object.
+    
+    Args:
+        cache_path: Path of the cache file to read
+        
+    Returns:
+        The enhanced ASG data
+        
+    Raises:
+        OSError: If the file can't be read
+        ValueError: If the file is empty or not valid JSON
+    """
+    if ORJSON_AVAILABLE:
+        with open(cache_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+    with open(cache_path, 'r') as f:
+        return json.load(f)
+
+
+def add_enhanced_js_ts_semantic_edges(ast: Dict, edges: List[Tuple]):
     """
     Add enhanced JavaScript/TypeScript-specific semantic edges to the ASG.
     
@@ -511,8 +959,8 @@ def add_enhanced_js_ts_semantic_edges(ast: Dict, edges: List[Dict]):
 def generate_ast_diff(
     ast_old: Dict, 
     ast_new: Dict, 
-    source_old: str, 
-    source_new: str
+    source_old: Union[str, bytes], 
+    source_new: Union[str, bytes]
 ) -> Dict:
     """
     Generate a diff between two ASTs, showing only the changed nodes.
@@ -535,16 +983,16 @@ def generate_ast_diff(
             "error": "Both ASTs must have tree_object property for diffing"
         }
     
-    old_tree = ast_old["tree_object"]
+    # Tree-sitter compares trees by position, so the old tree must first be
+    # edited to line up with the new source. Edit a copy, since the old tree
+    # may also be in the tree cache.
+    old_tree = ast_old["tree_object"].copy()
+    edit_tree(old_tree, _source_bytes(source_old), _source_bytes(source_new))
     new_tree = ast_new["tree_object"]
     
-    # Get changed ranges from Tree-sitter
-    old_source_bytes = bytes(source_old, 'utf-8')
-    new_source_bytes = bytes(source_new, 'utf-8')
-    
-    # Get the changed ranges
+    # Get the changed ranges from Tree-sitter
     changed_ranges = []
-    for edit in new_tree.get_changed_ranges(old_tree):
+    for edit in old_tree.changed_ranges(new_tree):
         changed_ranges.append({
             "start_byte": edit.start_byte,
             "end_byte": edit.end_byte,
@@ -552,29 +1000,36 @@ def generate_ast_diff(
             "end_point": {"row": edit.end_point[0], "column": edit.end_point[1]}
         })
     
-    # Find nodes in the new AST that are in the changed ranges
+    # Find the first node (in pre-order) of the new AST that overlaps a
+    # changed range. Ranges are sorted once so each node costs one bisect.
     changed_nodes = []
+    sorted_ranges = sorted(changed_ranges, key=lambda r: r["start_byte"])
+    range_starts = [r["start_byte"] for r in sorted_ranges]
+    # max_ends[i] is the furthest end byte among the first i + 1 ranges
+    max_ends = list(accumulate((r["end_byte"] for r in sorted_ranges), max))
     
-    def find_nodes_in_range(node, ranges):
-        # Check if this node is in any of the changed ranges
-        node_start = node["start_byte"]
-        node_end = node["end_byte"]
+    if sorted_ranges:
+        first_start = range_starts[0]
+        last_end = max_ends[-1]
+        stack = [ast_new["ast"]]
         
-        for r in ranges:
-            # If there's any overlap between the node and the range
-            if not (node_end <= r["start_byte"] or node_start >= r["end_byte"]):
+        while stack:
+            node = stack.pop()
+            node_start = node["start_byte"]
+            node_end = node["end_byte"]
+            
+            # Prune subtrees that lie entirely outside all of the ranges
+            if node_end <= first_start or node_start >= last_end:
+                continue
+            
+            # Ranges starting before node_end overlap if any ends after node_start
+            i = bisect_left(range_starts, node_end)
+            if i and max_ends[i - 1] > node_start:
                 changed_nodes.append(node)
-                return True
-        
-        # If node is not changed, check its children
-        for child in node.get("children", []):
-            if find_nodes_in_range(child, ranges):
-                return True
-        
-        return False
-    
-    # Start from the root
-    find_nodes_in_range(ast_new["ast"], changed_ranges)
+                break
+            
+            # Push children in reverse so they are visited in order
+            stack.extend(reversed(node.get("children", ())))
     
     return {
         "language": ast_new["language"],
@@ -585,10 +1040,120 @@ def generate_ast_diff(
     }
 
 
+def diff_ast_parallel(
+    old_code: Union[str, bytes],
+    new_code: Union[str, bytes],
+    language: Optional[str] = None,
+    filename: Optional[str] = None
+) -> Dict:
+    """
+    Parse two versions of code concurrently and diff their ASTs.
+    
+    The old version is parsed on a worker thread while the calling thread
+    parses the new one; tree-sitter releases the GIL while parsing.
+    
+    Args:
+        old_code: Previous version of the code, as text or UTF-8 bytes
+        new_code: New version of the code, as text or UTF-8 bytes
+        language: Programming language identifier (optional)
+        filename: Source file name (optional, used for language detection)
+        
+    Returns:
+        Dictionary with the changed nodes and metadata (see generate_ast_diff)
+    """
+    old_source_bytes = _source_bytes(old_code)
+    new_source_bytes = _source_bytes(new_code)
+    
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future_old = pool.submit(parse_code_to_ast_incremental, old_source_bytes, language, filename)
+        ast_new = parse_code_to_ast_incremental(new_source_bytes, language, filename)
+        ast_old = future_old.result()
+    
+    if "error" in ast_old:
+        return ast_old
+    if "error" in ast_new:
+        return ast_new
+    
+    return generate_ast_diff(ast_old, ast_new, old_source_bytes, new_source_bytes)
+
+
+def build_position_index(root: Dict) -> Dict:
+    """
+    Flatten an AST into pre-order arrays of node spans for position lookups.
+    
+    Args:
+        root: The root node of the AST
+        
+    Returns:
+        Dictionary with the nodes in pre-order, their start/end rows and
+        columns, and for each node the index just past its subtree
+    """
+    nodes = []
+    parents = array("l")
+    start_rows = array("l")
+    start_cols = array("l")
+    end_rows = array("l")
+    end_cols = array("l")
+    
+    stack = [(root, -1)]
+    while stack:
+        node, parent_index = stack.pop()
+        index = len(nodes)
+        nodes.append(node)
+        parents.append(parent_index)
+        start_rows.append(node["start_point"]["row"])
+        start_cols.append(node["start_point"]["column"])
+        end_rows.append(node["end_point"]["row"])
+        end_cols.append(node["end_point"]["column"])
+        # Push children in reverse so they are numbered in order
+        for child in reversed(node.get("children", ())):
+            stack.append((child, index))
+    
+    # Subtree sizes accumulate from the leaves up, since children always
+    # come after their parent in pre-order
+    sizes = array("l", [1]) * len(nodes)
+    for index in range(len(nodes) - 1, 0, -1):
+        sizes[parents[index]] += sizes[index]
+    
+    return {
+        "nodes": nodes,
+        "start_rows": start_rows,
+        "start_cols": start_cols,
+        "end_rows": end_rows,
+        "end_cols": end_cols,
+        "subtree_ends": array("l", (index + size for index, size in enumerate(sizes)))
+    }
+
+
+def _locate(start_rows, start_cols, end_rows, end_cols, subtree_ends, line, column):
+    """Return the pre-order index of the deepest node containing a position, or -1."""
+    # Walk the nodes in pre-order, descending into nodes that contain the
+    # position and skipping the subtrees of those that don't. The last
+    # containing node visited is the most specific one.
+    best_match = -1
+    i = 0
+    count = len(subtree_ends)
+    while i < count:
+        if (start_rows[i] <= line <= end_rows[i]
+                and not (start_rows[i] == line and column < start_cols[i])
+                and not (end_rows[i] == line and column > end_cols[i])):
+            best_match = i
+            i += 1
+        else:
+            i = subtree_ends[i]
+    return best_match
+
+
+if NUMBA_AVAILABLE:
+    # Cache the compiled loop on disk so server restarts skip recompiling
+    _locate = njit(cache=True)(_locate)
+
+
 def get_node_by_position(
     ast: Dict, 
     line: int, 
-    column: int
+    column: int,
+    index: Optional[Dict] = None
 ) -> Optional[Dict]:
     """
     Find the most specific node at a given line and column position.
@@ -600,33 +1165,22 @@ def get_node_by_position(
         ast: The AST data
         line: Line number (0-based)
         column: Column number (0-based)
+        index: Optional position index from build_position_index, reused
+            across lookups on the same AST
         
     Returns:
         The node at the given position, or None if not found
     """
-    def find_node(node):
-        # Check if the position is within this node's range
-        if (node["start_point"]["row"] <= line <= node["end_point"]["row"]):
-            # If on start or end line, check column as well
-            if node["start_point"]["row"] == line and column < node["start_point"]["column"]:
-                return None
-            if node["end_point"]["row"] == line and column > node["end_point"]["column"]:
-                return None
-            
-            # Position is within this node, check children for more specific match
-            best_match = node
-            
-            for child in node.get("children", []):
-                child_match = find_node(child)
-                if child_match is not None:
-                    # Child contains the position, its more specific than current node
-                    best_match = child_match
-            
-            return best_match
-        
-        return None
+    if index is None:
+        index = build_position_index(ast["ast"])
+    
+    best_match = _locate(
+        index["start_rows"], index["start_cols"],
+        index["end_rows"], index["end_cols"],
+        index["subtree_ends"], line, column
+    )
     
-    return find_node(ast["ast"])
+    return index["nodes"][best_match] if best_match >= 0 else None
 
 
 def register_enhanced_tools(mcp_server):
@@ -656,28 +1210,33 @@ def register_enhanced_tools(mcp_server):
             A dictionary containing the AST and language information,
             along with diff information if old_code was provided
         """
-        # If old_code is provided, try to use it for incremental parsing
+        # Encode once here and pass bytes through to the parser and caches
+        source_bytes = _source_bytes(code)
+        old_source_bytes = _source_bytes(old_code) if old_code else None
+        
+        # If old_code is provided, try to use it for incremental parsing.
+        # Only its tree is needed, so skip building a dict AST for it.
         previous_tree = None
-        if old_code:
-            # First parse the old code to get a tree
-            old_result = parse_code_to_ast_incremental(old_code, language, filename)
-            if "error" not in old_result and "tree_object" in old_result:
-                previous_tree = old_result["tree_object"]
+        if old_source_bytes and (languages or init_parsers()):
+            old_language = resolve_language(old_code, language, filename)
+            if old_language in languages:
+                previous_tree = _parse_only(old_source_bytes, old_language)
         
         # Parse the new code, potentially using the previous tree
         return parse_code_to_ast_incremental(
-            code, 
+            source_bytes, 
             language, 
             filename, 
             previous_tree, 
-            old_code
+            old_source_bytes
         )
     
     @mcp_server.tool()
     def generate_enhanced_asg(
         code: str, 
         language: Optional[str] = None, 
-        filename: Optional[str] = None
+        filename: Optional[str] = None,
+        edge_kinds: Optional[List[str]] = None
     ) -> Dict:
         """
         Generate an enhanced Abstract Semantic Graph (ASG) from code.
@@ -690,12 +1249,18 @@ def register_enhanced_tools(mcp_server):
             language: The programming language (e.g., 'python', 'javascript')
                      If not provided, the tool will attempt to detect it
             filename: Optional filename to help with language detection
+            edge_kinds: Optional list of edge types to include ("contains",
+                       "control_flow", "calls", "calls_import", "references").
+                       Semantic analysis is skipped if only "contains" is requested.
             
         Returns:
             A dictionary containing the enhanced ASG with nodes, edges, and metadata
         """
-        ast_data = parse_code_to_ast_incremental(code, language, filename)
-        return create_enhanced_asg_from_ast(ast_data)
+        # The ASG is built from the native tree, so skip the nested dict AST
+        ast_data = parse_code_to_ast_incremental(code, language, filename, include_children=False)
+        return create_enhanced_asg_from_ast(
+            ast_data, set(edge_kinds) if edge_kinds is not None else None
+        )
     
     @mcp_server.tool()
     def diff_ast(
@@ -719,15 +1284,7 @@ def register_enhanced_tools(mcp_server):
         Returns:
             A dictionary with the changed nodes and metadata
         """
-        ast_old = parse_code_to_ast_incremental(old_code, language, filename)
-        ast_new = parse_code_to_ast_incremental(new_code, language, filename)
-        
-        if "error" in ast_old:
-            return ast_old
-        if "error" in ast_new:
-            return ast_new
-        
-        return generate_ast_diff(ast_old, ast_new, old_code, new_code)
+        return diff_ast_parallel(old_code, new_code, language, filename)
     
     @mcp_server.tool()
     def find_node_at_position(
@@ -753,12 +1310,32 @@ def register_enhanced_tools(mcp_server):
         Returns:
             The node at the given position, or an error if not found
         """
-        ast_data = parse_code_to_ast_incremental(code, language, filename)
+        # Reuse the position index when the same code is queried repeatedly,
+        # e.g. when following a cursor
+        source_bytes = _source_bytes(code)
+        cache_key = _tree_cache_key(
+            resolve_language(code, language, filename), source_bytes
+        )
+        cached = _position_index_cache.get(cache_key)
         
-        if "error" in ast_data:
-            return ast_data
+        if cached is not None:
+            _position_index_cache.move_to_end(cache_key)
+            ast_data = cached["ast_data"]
+        else:
+            ast_data = parse_code_to_ast_incremental(source_bytes, language, filename)
+            
+            if "error" in ast_data:
+                return ast_data
+            
+            cached = {
+                "ast_data": ast_data,
+                "index": build_position_index(ast_data["ast"])
+            }
+            _position_index_cache[cache_key] = cached
+            if len(_position_index_cache) > POSITION_INDEX_CACHE_SIZE:
+                _position_index_cache.popitem(last=False)
         
-        node = get_node_by_position(ast_data, line, column)
+        node = get_node_by_position(ast_data, line, column, cached["index"])
         
         if node:
             return {
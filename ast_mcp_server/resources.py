@@ -6,49 +6,362 @@ through the Model Context Protocol.
 """
 
 import os
-import json
-from typing import Dict, Optional, List, Any
+import pickle
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, List, Any, Union
 import tempfile
 import hashlib
-from .tools import parse_code_to_ast, create_asg_from_ast, analyze_code_structure
+from stat import S_ISDIR
+from .tools import parse_code_to_ast, create_asg_from_ast, analyze_code_structure, node_text, node_key, parse_node_id
+
+# xxhash and blake3 are optional; cache keys fall back to BLAKE2b when
+# neither is installed
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+def _cache_root() -> str:
+    """Prefer the tmpfs at /dev/shm for the cache so entries never touch disk."""
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return tempfile.gettempdir()
+
+def _private_cache_dir() -> str:
+    """
+    Create or reuse the current user's cache directory.
+    
+    Cache entries are unpickled when loaded, so the directory must not be
+    writable by anyone else. Its name includes the uid, and an existing
+    directory is only reused if it is a real directory owned by this user
+    with no group or other permissions; otherwise a fresh private
+    directory is created instead.
+    
+    Returns:
+        Path of the cache directory
+    """
+    getuid = getattr(os, "getuid", None)
+    if getuid is None:
+        # No uids (Windows): the temp directory is already per user
+        path = os.path.join(tempfile.gettempdir(), "ast_mcp_cache")
+        os.makedirs(path, exist_ok=True)
+        return path
+    
+    uid = getuid()
+    path = os.path.join(_cache_root(), f"ast_mcp_cache_{uid}")
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if S_ISDIR(info.st_mode) and info.st_uid == uid and not info.st_mode & 0o077:
+        return path
+    print(f"Not using cache directory {path}: not a private directory owned by uid {uid}")
+    return tempfile.mkdtemp(prefix=f"ast_mcp_cache_{uid}_", dir=_cache_root())
 
 # Directory to store cached ASTs and ASGs
-CACHE_DIR = os.path.join(tempfile.gettempdir(), "ast_mcp_cache")
-os.makedirs(CACHE_DIR, exist_ok=True)
+CACHE_DIR = _private_cache_dir()
 
-def get_cache_path(code_hash: str, resource_type: str) -> str:
+# Limits on the cache directory; least recently used files are removed
+# once either is exceeded
+MAX_CACHE_BYTES = int(os.environ.get("AST_MCP_CACHE_BYTES", 512 * 1024 * 1024))
+MAX_CACHE_FILES = int(os.environ.get("AST_MCP_CACHE_FILES", 10_000))
+
+# Suffix of the temporary files cache entries are written to before being
+# renamed into place
+TEMP_SUFFIX = ".tmp"
+
+def _scan_cache_dir() -> "OrderedDict[str, int]":
+    """List the cache directory's files and sizes, least recently used first."""
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            # Temporary files of writes in progress (see atomic_write) are
+            # not cache entries
+            if entry.is_file() and not entry.name.endswith(TEMP_SUFFIX):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+    entries.sort()
+    return OrderedDict((name, size) for _, name, size in entries)
+
+# Files in the cache directory and their sizes in LRU order, read once at
+# startup and then kept up to date here, so existence checks and eviction
+# don't need to list or stat the directory
+_cache_files = _scan_cache_dir()
+_cache_bytes = sum(_cache_files.values())
+
+# In-process layer over the cache directory, keyed on (code_hash, resource_type)
+MEMORY_CACHE_SIZE = 128
+_memory_cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+
+# Node key -> node dict lookup tables for cached ASTs, keyed on code hash
+NODE_INDEX_CACHE_SIZE = 32
+_node_index_cache: "OrderedDict[str, Dict[tuple, Dict]]" = OrderedDict()
+
+def get_cache_path(code_hash: str, resource_type: str, extension: str = "pkl") -> str:
     """Get the cache file path for a given code hash and resource type."""
-    return os.path.join(CACHE_DIR, f"{code_hash}_{resource_type}.json")
+    return os.path.join(CACHE_DIR, f"{code_hash}_{resource_type}.{extension}")
+
+def get_code_hash(code: Union[str, bytes]) -> str:
+    """
+    Generate a hash for the code to use as a cache key.
+    
+    The hash only identifies cache entries, so the fastest available
+    128-bit digest is used: xxh3, then BLAKE3 (SIMD), then BLAKE2b.
+    
+    Args:
+        code: Source code, as text or already-encoded UTF-8 bytes
+        
+    Returns:
+        Hex digest of the code
+    """
+    code_bytes = code.encode('utf-8') if isinstance(code, str) else code
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_hexdigest(code_bytes)
+    if BLAKE3_AVAILABLE:
+        return blake3.blake3(code_bytes).hexdigest(length=16)
+    return hashlib.blake2b(code_bytes, digest_size=16).hexdigest()
+
+def _remember(key: tuple, data: Dict) -> None:
+    """Put a resource into the in-process LRU."""
+    _memory_cache[key] = data
+    _memory_cache.move_to_end(key)
+    if len(_memory_cache) > MEMORY_CACHE_SIZE:
+        _memory_cache.popitem(last=False)
+
+@contextmanager
+def atomic_write(cache_path: str, mode: str = 'wb'):
+    """
+    Open a cache file for writing so that readers never see it half-written.
+    
+    Data goes to a temporary file in the cache directory, which replaces
+    cache_path only once it is complete; on error it is removed instead.
+    
+    Args:
+        cache_path: Path of the cache file to write
+        mode: File mode, 'wb' or 'w'
+        
+    Yields:
+        The open temporary file
+    """
+    tmp = tempfile.NamedTemporaryFile(
+        mode, dir=os.path.dirname(cache_path), prefix=".", suffix=TEMP_SUFFIX, delete=False
+    )
+    try:
+        with tmp:
+            yield tmp
+        os.replace(tmp.name, cache_path)
+    except BaseException:
+        try:
+            os.remove(tmp.name)
+        except FileNotFoundError:
+            pass
+        raise
+
+def track_cache_file(cache_path: str) -> None:
+    """
+    Record a file just written to the cache directory and evict the least
+    recently used files if the cache is over its limits.
+    
+    Args:
+        cache_path: Path of the written file
+    """
+    global _cache_bytes
+    name = os.path.basename(cache_path)
+    size = os.path.getsize(cache_path)
+    _cache_bytes += size - _cache_files.pop(name, 0)
+    _cache_files[name] = size
+    
+    while _cache_files and (_cache_bytes > MAX_CACHE_BYTES or len(_cache_files) > MAX_CACHE_FILES):
+        old_name, old_size = _cache_files.popitem(last=False)
+        _cache_bytes -= old_size
+        try:
+            os.remove(os.path.join(CACHE_DIR, old_name))
+        except FileNotFoundError:
+            pass
+
+def cache_file_exists(cache_path: str) -> bool:
+    """Check for a cache file, marking it as recently used if it exists."""
+    name = os.path.basename(cache_path)
+    if name not in _cache_files:
+        return False
+    _cache_files.move_to_end(name)
+    try:
+        # Keep the mtime current so the LRU order survives restarts
+        os.utime(cache_path)
+    except FileNotFoundError:
+        global _cache_bytes
+        _cache_bytes -= _cache_files.pop(name)
+        return False
+    return True
 
-def get_code_hash(code: str) -> str:
-    """Generate a hash for the code to use as a cache key."""
-    return hashlib.md5(code.encode('utf-8')).hexdigest()
+def _write_ast_source(code_hash: str, language: str, source: str) -> str:
+    """Write the source file of a cached AST, returning its path."""
+    cache_path = get_cache_path(code_hash, "ast", "src")
+    with atomic_write(cache_path) as f:
+        f.write(language.encode('utf-8') + b"\n" + source.encode('utf-8'))
+    return cache_path
 
-def cache_resource(code: str, resource_type: str, data: Dict) -> None:
-    """Cache a resource for faster retrieval."""
-    code_hash = get_code_hash(code)
+def store_resource(code_hash: str, resource_type: str, data: Dict) -> None:
+    """
+    Write a resource to the cache directory and the in-process LRU.
+    
+    Args:
+        code_hash: Hash identifying the resource
+        resource_type: Kind of resource (ast, asg, analysis, ...)
+        data: Resource data; a native tree-sitter tree under "tree_object"
+            is not stored
+    """
+    if "tree_object" in data:
+        data = {k: v for k, v in data.items() if k != "tree_object"}
+    
+    if resource_type == "ast" and "source" in data:
+        # The AST dict is many times larger than its source and tree-sitter
+        # reparses quickly, so only the source and its language are stored
+        cache_path = _write_ast_source(code_hash, data["language"], data["source"])
+    else:
+        cache_path = get_cache_path(code_hash, resource_type)
+        with atomic_write(cache_path) as f:
+            pickle.dump(data, f, protocol=5)
+    track_cache_file(cache_path)
+    _remember((code_hash, resource_type), data)
+    if resource_type == "ast":
+        _node_index_cache.pop(code_hash, None)
+
+def load_resource(code_hash: str, resource_type: str) -> Optional[Dict]:
+    """
+    Load a cached resource, checking the in-process LRU before the cache directory.
+    
+    Args:
+        code_hash: Hash identifying the resource
+        resource_type: Kind of resource (ast, asg, analysis, ...)
+        
+    Returns:
+        The resource data, or None if it has not been cached
+    """
+    key = (code_hash, resource_type)
+    data = _memory_cache.get(key)
+    if data is not None:
+        _memory_cache.move_to_end(key)
+        return data
+    
+    source_path = get_cache_path(code_hash, resource_type, "src")
     cache_path = get_cache_path(code_hash, resource_type)
+    if resource_type == "ast" and cache_file_exists(source_path):
+        with open(source_path, 'rb') as f:
+            language, _, source = f.read().partition(b"\n")
+        data = parse_code_to_ast(source.decode('utf-8'), language.decode('utf-8'))
+    elif cache_file_exists(cache_path):
+        with open(cache_path, 'rb') as f:
+            data = pickle.load(f)
+    else:
+        return None
+    # A failed reparse (e.g. parsers unavailable) may succeed next time
+    if "error" not in data:
+        _remember(key, data)
+    return data
+
+def build_node_index(root: Dict) -> Dict[tuple, Dict]:
+    """
+    Map every node key in an AST to its node dict.
+    
+    Keys are (type, start_byte, end_byte) tuples, as parsed from node IDs by
+    parse_node_id. When two nodes share a key, the first one in preorder wins.
     
+    Args:
+        root: Root node of an AST dict
+        
+    Returns:
+        Dictionary from node key to node
+    """
+    index = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        key = node_key(node)
+        if key not in index:
+            index[key] = node
+        children = node.get("children")
+        if children:
+            stack.extend(reversed(children))
+    return index
+
+def get_node_index(code_hash: str, ast_data: Dict) -> Dict[tuple, Dict]:
+    """Get the node index for a cached AST, building it on first use."""
+    index = _node_index_cache.get(code_hash)
+    if index is not None:
+        _node_index_cache.move_to_end(code_hash)
+        return index
+    
+    index = build_node_index(ast_data["ast"])
+    _node_index_cache[code_hash] = index
+    if len(_node_index_cache) > NODE_INDEX_CACHE_SIZE:
+        _node_index_cache.popitem(last=False)
+    return index
+
+def cache_resource(code: str, resource_type: str, data: Dict, code_hash: Optional[str] = None) -> None:
+    """Cache a resource for faster retrieval; pass code_hash if the caller already hashed the code."""
     try:
-        with open(cache_path, 'w') as f:
-            json.dump(data, f)
+        store_resource(code_hash or get_code_hash(code), resource_type, data)
     except Exception as e:
         print(f"Error caching resource: {e}")
 
-def get_cached_resource(code: str, resource_type: str) -> Optional[Dict]:
-    """Get a cached resource if available."""
-    code_hash = get_code_hash(code)
-    cache_path = get_cache_path(code_hash, resource_type)
+def cache_ast_source(code: str, language: str, code_hash: Optional[str] = None) -> None:
+    """
+    Cache the AST of code by its source alone.
+    
+    For callers whose AST dict differs from parse_code_to_ast's (e.g. with
+    node text): load_resource rebuilds the usual AST from the source, so
+    ast:// returns the same shape whichever tool cached it.
     
-    if os.path.exists(cache_path):
+    Args:
+        code: Source code
+        language: Normalized language identifier
+        code_hash: Hash of the code, if the caller already computed it
+    """
+    try:
+        code_hash = code_hash or get_code_hash(code)
+        track_cache_file(_write_ast_source(code_hash, language, code))
+        _memory_cache.pop((code_hash, "ast"), None)
+        _node_index_cache.pop(code_hash, None)
+    except Exception as e:
+        print(f"Error caching resource: {e}")
+
+def cache_resources(code: str, resources: Dict[str, Dict], code_hash: Optional[str] = None) -> None:
+    """Cache several resources for the same code, hashing it at most once."""
+    code_hash = code_hash or get_code_hash(code)
+    for resource_type, data in resources.items():
         try:
-            with open(cache_path, 'r') as f:
-                return json.load(f)
+            store_resource(code_hash, resource_type, data)
         except Exception as e:
-            print(f"Error reading cached resource: {e}")
+            print(f"Error caching resource: {e}")
+
+def get_cached_resource(code: str, resource_type: str, code_hash: Optional[str] = None) -> Optional[Dict]:
+    """Get a cached resource if available; pass code_hash if the caller already hashed the code."""
+    try:
+        return load_resource(code_hash or get_code_hash(code), resource_type)
+    except Exception as e:
+        print(f"Error reading cached resource: {e}")
     
     return None
 
+def has_cached_resource(code_hash: str, resource_type: str) -> bool:
+    """Check whether a resource is cached, without loading it."""
+    if (code_hash, resource_type) in _memory_cache:
+        return True
+    if resource_type == "ast" and cache_file_exists(get_cache_path(code_hash, resource_type, "src")):
+        return True
+    return cache_file_exists(get_cache_path(code_hash, resource_type))
+
 def register_resources(mcp_server):
     """Register all resources with the MCP server."""
     
@@ -66,14 +379,13 @@ def register_resources(mcp_server):
         Returns:
             The cached AST data
         """
-        cache_path = get_cache_path(code_hash, "ast")
+        try:
+            data = load_resource(code_hash, "ast")
+        except Exception as e:
+            return {"error": f"Error reading cached AST: {e}"}
         
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                return {"error": f"Error reading cached AST: {e}"}
+        if data is not None:
+            return data
         
         return {"error": "AST not found. Please use parse_to_ast tool first."}
     
@@ -91,14 +403,13 @@ def register_resources(mcp_server):
         Returns:
             The cached ASG data
         """
-        cache_path = get_cache_path(code_hash, "asg")
+        try:
+            data = load_resource(code_hash, "asg")
+        except Exception as e:
+            return {"error": f"Error reading cached ASG: {e}"}
         
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                return {"error": f"Error reading cached ASG: {e}"}
+        if data is not None:
+            return data
         
         return {"error": "ASG not found. Please use generate_asg tool first."}
     
@@ -116,14 +427,13 @@ def register_resources(mcp_server):
         Returns:
             The cached analysis data
         """
-        cache_path = get_cache_path(code_hash, "analysis")
+        try:
+            data = load_resource(code_hash, "analysis")
+        except Exception as e:
+            return {"error": f"Error reading cached analysis: {e}"}
         
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                return {"error": f"Error reading cached analysis: {e}"}
+        if data is not None:
+            return data
         
         return {"error": "Analysis not found. Please use analyze_code tool first."}
     
@@ -140,35 +450,19 @@ def register_resources(mcp_server):
         Returns:
             The node details
         """
-        # Get the full AST
-        cache_path = get_cache_path(code_hash, "ast")
-        
-        if not os.path.exists(cache_path):
-            return {"error": "AST not found. Please use parse_to_ast tool first."}
-        
         try:
-            with open(cache_path, 'r') as f:
-                ast_data = json.load(f)
-            
-            # Find the node by its ID
-            def find_node(node, target_id):
-                # Generate this node's ID
-                current_id = f"{node['type']}_{node['start_byte']}_{node['end_byte']}"
-                
-                if current_id == target_id:
-                    return node
-                
-                # Search in children
-                for child in node.get("children", []):
-                    result = find_node(child, target_id)
-                    if result:
-                        return result
-                
-                return None
+            # Get the full AST
+            ast_data = load_resource(code_hash, "ast")
+            if ast_data is None:
+                return {"error": "AST not found. Please use parse_to_ast tool first."}
             
-            node = find_node(ast_data["ast"], node_id)
+            # Look the node up by its ID
+            node = get_node_index(code_hash, ast_data).get(parse_node_id(node_id))
             
             if node:
+                # Cached ASTs don't carry node text; decode it for this node only
+                if "text" not in node and "source" in ast_data:
+                    node = dict(node, text=node_text(node, bytes(ast_data["source"], 'utf-8')))
                 return node
             else:
                 return {"error": f"Node with ID {node_id} not found in the AST"}
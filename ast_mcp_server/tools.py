@@ -5,11 +5,17 @@ This module defines the tools that provide code structure and semantic analysis
 capabilities through the Model Context Protocol.
 """
 
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Optional, Union, Any, Tuple
 import os
+import re
+import sys
 import json
 import importlib
-from tree_sitter import Parser, Node
+import threading
+from collections import OrderedDict
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from tree_sitter import Parser, Node, Tree, Query, QueryCursor
 
 # Try to import language modules
 LANGUAGE_MODULES = {
@@ -44,6 +50,15 @@ LANGUAGE_MAP = {
 # Initialize parser and languages
 languages = {}
 
+# Parsers are reused across calls, one per language and thread since a
+# Parser must not run two parses at once
+_parser_local = threading.local()
+
+# Last (language, source, tree) parsed for each session, so the next parse
+# in the session can reuse the unchanged parts of the tree
+SESSION_TREE_CACHE_SIZE = 64
+_session_trees: "OrderedDict[str, Tuple[str, bytes, Tree]]" = OrderedDict()
+
 def init_parsers():
     """Initialize the tree-sitter parsers."""
     global languages
@@ -76,10 +91,351 @@ def init_parsers():
         print(f"Error initializing parsers: {e}")
         return False
 
-def node_to_dict(node: Node, source_bytes: bytes, include_children: bool = True) -> Dict:
-    """Convert a tree-sitter Node to a dictionary representation."""
+def get_parser(language: str) -> Parser:
+    """Get this thread's parser for a language, creating it on first use."""
+    parsers = getattr(_parser_local, "parsers", None)
+    if parsers is None:
+        parsers = _parser_local.parsers = {}
+    parser = parsers.get(language)
+    if parser is None:
+        parser = Parser()
+        parser.language = languages[language]
+        parsers[language] = parser
+    return parser
+
+# Tree-sitter query picking out the nodes the Python semantic edges are
+# built from, so the matching runs in tree-sitter rather than a Python walk
+PYTHON_SEMANTIC_QUERY = """
+(function_definition name: (identifier) body: (block)) @scope
+(class_definition name: (identifier) body: (block)) @scope
+(assignment left: (identifier) @assignment)
+(call function: (identifier) @call)
+(identifier) @identifier
+"""
+
+# Tree-sitter query for the structure summary of Python code
+PYTHON_STRUCTURE_QUERY = """
+(function_definition) @function
+(class_definition) @class
+[(import_statement) (import_from_statement)] @import
+[(if_statement) (for_statement) (while_statement) (try_statement) (with_statement)] @nesting
+"""
+
+# Compiled queries keyed by (language, query source)
+_queries: Dict[Tuple[str, str], Query] = {}
+
+# Node types that add a nesting level to the structure metrics
+NESTING_NODE_TYPES = frozenset({
+    "if_statement", "for_statement", "while_statement", "try_statement", "with_statement"
+})
+
+def get_query(language: str, query_source: str) -> Query:
+    """
+    Get a compiled tree-sitter query, compiling it only on first use.
+    
+    Args:
+        language: Language identifier the query is written for
+        query_source: Query pattern source
+        
+    Returns:
+        The compiled Query
+    """
+    key = (language, query_source)
+    query = _queries.get(key)
+    if query is None:
+        query = _queries[key] = Query(languages[language], query_source)
+    return query
+
+def node_text(node: Dict, source_bytes: Union[bytes, memoryview, None]) -> str:
+    """Get the source text of a dict node, slicing it from the source if the node carries none."""
+    if "text" in node:
+        return node["text"]
+    return str(source_bytes[node["start_byte"]:node["end_byte"]], 'utf-8')
+
+def node_key(node: Dict) -> Tuple[str, int, int]:
+    """Return the (type, start_byte, end_byte) key identifying a dict AST node."""
+    return (node["type"], node["start_byte"], node["end_byte"])
+
+def format_node_id(key: Tuple[str, int, int]) -> str:
+    """Format a node key as the "{type}_{start_byte}_{end_byte}" ID used in results."""
+    return f"{key[0]}_{key[1]}_{key[2]}"
+
+def parse_node_id(node_id: str) -> Optional[Tuple[str, int, int]]:
+    """Parse a node ID back into its key; returns None if it is malformed."""
+    node_type, _, rest = node_id.rpartition("_")
+    node_type, _, start = node_type.rpartition("_")
+    if not node_type or not start.isdigit() or not rest.isdigit():
+        return None
+    return (node_type, int(start), int(rest))
+
+def _function_summary(node: Node, source_bytes: bytes) -> Dict:
+    """Name, location and plain parameter names of a Python function_definition."""
+    children = node.children
+    name = ""
+    for child in children:
+        if child.type == "identifier":
+            name = source_bytes[child.start_byte:child.end_byte].decode('utf-8')
+            break
+
+    params = []
+    for child in children:
+        if child.type == "parameters":
+            for param_child in child.children:
+                if param_child.type == "identifier":
+                    params.append(
+                        source_bytes[param_child.start_byte:param_child.end_byte].decode('utf-8')
+                    )
+
+    return {
+        "name": name,
+        "location": {
+            "start_line": node.start_point[0] + 1,
+            "end_line": node.end_point[0] + 1
+        },
+        "parameters": params
+    }
+
+def _class_summary(node: Node, source_bytes: bytes) -> Dict:
+    """Name and location of a Python class_definition."""
+    name = ""
+    for child in node.children:
+        if child.type == "identifier":
+            name = source_bytes[child.start_byte:child.end_byte].decode('utf-8')
+            break
+
+    return {
+        "name": name,
+        "location": {
+            "start_line": node.start_point[0] + 1,
+            "end_line": node.end_point[0] + 1
+        }
+    }
+
+def _import_summary(node: Node, source_bytes: bytes) -> Dict:
+    """Module name and line of a Python import statement."""
+    module_names = [
+        source_bytes[child.start_byte:child.end_byte].decode('utf-8')
+        for child in node.children
+        if child.type == "dotted_name"
+    ]
+    return {
+        "module": ".".join(module_names),
+        "line": node.start_point[0] + 1
+    }
+
+def python_structure_from_tree(root: Node, source_bytes: bytes) -> Dict:
+    """
+    Collect the structure of Python code without walking the tree in Python.
+    
+    Node counting and matching run in tree-sitter: the node count comes from
+    descendant_count and the structures from a query, so Python only visits
+    the matched nodes. Nesting depth is derived from the nesting nodes'
+    byte ranges.
+    
+    Args:
+        root: Root node of a Python tree
+        source_bytes: Source the tree was parsed from
+        
+    Returns:
+        The same "structure" dictionary that node_to_all builds
+    """
+    captures = QueryCursor(get_query("python", PYTHON_STRUCTURE_QUERY)).captures(root)
+    by_position = lambda node: (node.start_byte, -node.end_byte)
+
+    # Nesting nodes in preorder; each one's depth is the number of nesting
+    # nodes still open around it, plus itself
+    max_nesting = 0
+    open_ends = []
+    for node in sorted(captures.get("nesting", ()), key=by_position):
+        while open_ends and node.start_byte >= open_ends[-1]:
+            open_ends.pop()
+        open_ends.append(node.end_byte)
+        max_nesting = max(max_nesting, len(open_ends))
+
+    return {
+        "functions": [_function_summary(node, source_bytes)
+                      for node in sorted(captures.get("function", ()), key=by_position)],
+        "classes": [_class_summary(node, source_bytes)
+                    for node in sorted(captures.get("class", ()), key=by_position)],
+        "imports": [_import_summary(node, source_bytes)
+                    for node in sorted(captures.get("import", ()), key=by_position)],
+        "total_nodes": root.descendant_count,
+        "max_nesting_level": max_nesting
+    }
+
+def node_to_all(node: Node, source_bytes: bytes, want=frozenset({"ast", "asg", "structure"}), include_text: bool = False) -> Dict:
+    """
+    Build the AST dict, ASG nodes and edges, and Python structure metrics
+    for a tree-sitter subtree in a single TreeCursor walk.
+
+    Args:
+        node: Root of the subtree to convert
+        source_bytes: Source the tree was parsed from
+        want: Which views to build: "ast", "asg" and/or "structure"
+        include_text: Whether AST dicts carry their source text; without
+            it, text is sliced from the source by start_byte/end_byte
+
+    Returns:
+        Dictionary with an entry for each requested view. "asg" holds the
+        nodes (without text), "contains" edges and root id; "structure" holds the functions,
+        classes, imports, total_nodes and max_nesting_level of Python code.
+    """
+    want_ast = "ast" in want
+    want_asg = "asg" in want
+    want_structure = "structure" in want
+    # Node text is decoded straight from views of the source; slicing the
+    # bytes would first copy every node's span, which adds up to many times
+    # the file size since each byte is inside every one of its ancestors
+    source_view = memoryview(source_bytes)
+
+    ast_root = None
+    asg_nodes = []
+    asg_edges = []
+    functions = []
+    classes = []
+    imports = []
+    total_nodes = 0
+    max_nesting = 0
+
+    # One (ast_dict, asg_id, nesting_depth) entry per node on the current path
+    path = []
+    cursor = node.walk()
+    # Node type names by kind id. Each distinct type string is created once,
+    # interned, and shared by every dict of that type, instead of one copy
+    # per node; interning also lets set lookups against the type tables
+    # match on identity.
+    type_names = {}
+
+    while True:
+        current = cursor.node
+        kind_id = current.kind_id
+        node_type = type_names.get(kind_id)
+        if node_type is None:
+            node_type = type_names[kind_id] = sys.intern(current.type)
+        start_byte = current.start_byte
+        end_byte = current.end_byte
+        parent = path[-1] if path else None
+
+        if include_text:
+            text = str(source_view[start_byte:end_byte], 'utf-8')
+        if want_ast or want_asg:
+            start_point = current.start_point
+            end_point = current.end_point
+
+        node_dict = None
+        if want_ast:
+            node_dict = {
+                "type": node_type,
+                "start_byte": start_byte,
+                "end_byte": end_byte,
+                "start_point": {
+                    "row": start_point[0],
+                    "column": start_point[1]
+                },
+                "end_point": {
+                    "row": end_point[0],
+                    "column": end_point[1]
+                }
+            }
+            if include_text:
+                node_dict["text"] = text
+            if current.child_count > 0:
+                node_dict["children"] = []
+
+            if parent is None:
+                ast_root = node_dict
+            else:
+                # Record the index of the first child for each field name
+                siblings = parent[0]["children"]
+                field_name = cursor.field_name
+                if field_name is not None:
+                    fields = parent[0].setdefault("fields", {})
+                    if field_name not in fields:
+                        fields[field_name] = len(siblings)
+                siblings.append(node_dict)
+
+        node_id = None
+        if want_asg:
+            node_id = f"{node_type}_{start_byte}_{end_byte}"
+            asg_nodes.append({
+                "id": node_id,
+                "type": node_type,
+                "start_byte": start_byte,
+                "end_byte": end_byte,
+                "start_line": start_point[0],
+                "start_col": start_point[1],
+                "end_line": end_point[0],
+                "end_col": end_point[1]
+            })
+            if parent is not None:
+                asg_edges.append({
+                    "source": parent[1],
+                    "target": node_id,
+                    "type": "contains"
+                })
+
+        depth = parent[2] if parent else 0
+        if want_structure:
+            total_nodes += 1
+            if node_type in NESTING_NODE_TYPES:
+                depth += 1
+                if depth > max_nesting:
+                    max_nesting = depth
+
+            if node_type == "function_definition":
+                functions.append(_function_summary(current, source_bytes))
+            elif node_type == "class_definition":
+                classes.append(_class_summary(current, source_bytes))
+            elif node_type == "import_statement" or node_type == "import_from_statement":
+                imports.append(_import_summary(current, source_bytes))
+
+        path.append((node_dict, node_id, depth))
+        if cursor.goto_first_child():
+            continue
+
+        # Leave finished nodes until one of them has a next sibling, stopping
+        # once the starting node itself is finished
+        while True:
+            path.pop()
+            if not path or cursor.goto_next_sibling():
+                break
+            cursor.goto_parent()
+
+        if not path:
+            break
+
+    result = {}
+    if want_ast:
+        result["ast"] = ast_root
+    if want_asg:
+        result["asg"] = {
+            "nodes": asg_nodes,
+            "edges": asg_edges,
+            "root": asg_nodes[0]["id"]
+        }
+    if want_structure:
+        result["structure"] = {
+            "functions": functions,
+            "classes": classes,
+            "imports": imports,
+            "total_nodes": total_nodes,
+            "max_nesting_level": max_nesting
+        }
+    return result
+
+def node_to_dict(node: Node, source_bytes: bytes, include_children: bool = True, include_text: bool = False) -> Dict:
+    """
+    Convert a tree-sitter Node to a dictionary representation.
+
+    Node text is left out unless include_text is set: the text of a node
+    repeats that of all its descendants, so for a whole file it adds up to
+    many copies of the source. Use node_text to slice it when needed.
+    """
+    if include_children:
+        return node_to_all(node, source_bytes, want={"ast"}, include_text=include_text)["ast"]
+
     result = {
-        "type": node.type,
+        "type": sys.intern(node.type),
         "start_byte": node.start_byte,
         "end_byte": node.end_byte,
         "start_point": {
@@ -89,110 +445,338 @@ def node_to_dict(node: Node, source_bytes: bytes, include_children: bool = True)
         "end_point": {
             "row": node.end_point[0],
             "column": node.end_point[1]
-        },
-        "text": source_bytes[node.start_byte:node.end_byte].decode('utf-8')
+        }
     }
-
-    if include_children and node.child_count > 0:
-        result["children"] = [node_to_dict(child, source_bytes, include_children)
-                             for child in node.children]
-
+    if include_text:
+        result["text"] = source_bytes[node.start_byte:node.end_byte].decode('utf-8')
     return result
 
-def create_field_edges(node: Dict, parent_id: Optional[str] = None) -> List[Dict]:
-    """Create field edges for the ASG (connecting nodes with their named fields)."""
-    edges = []
-    node_id = f"{node['type']}_{node['start_byte']}_{node['end_byte']}"
-
-    if parent_id:
-        edges.append({
-            "source": parent_id,
-            "target": node_id,
-            "type": "contains"
-        })
+# Language signature tokens for content-based detection. The lookahead lets
+# one scan report overlapping tokens (e.g. the ":" inside "std::").
+_LANGUAGE_TOKEN_RE = re.compile(
+    r"(?=(def |import |func |package |fn |let |->|const |function|=>|var |"
+    r"class |public |void |int |#include|std::|template<|[:{};]))"
+)
 
-    if "children" in node:
-        for child in node.get("children", []):
-            edges.extend(create_field_edges(child, node_id))
+# Only the start of a file is scanned; imports, package clauses and includes
+# come first, so the signature is almost always there
+DETECT_SAMPLE_SIZE = 4096
 
-    return edges
-
-def detect_language(code: str, filename: Optional[str] = None) -> str:
+def detect_language(code: Union[str, bytes], filename: Optional[str] = None) -> str:
     """Detect the programming language from code content and/or filename."""
     if filename:
         ext = filename.split('.')[-1].lower()
         if ext in LANGUAGE_MAP:
             return LANGUAGE_MAP[ext]
 
-    # Simple heuristics for language detection
-    if "def " in code and ":" in code and "import " in code:
+    if isinstance(code, bytes):
+        # Only the sample is scanned, so only the sample is decoded
+        code = code[:DETECT_SAMPLE_SIZE].decode('utf-8', 'ignore')
+
+    # Simple heuristics for language detection, from a single regex scan
+    tokens = set(_LANGUAGE_TOKEN_RE.findall(code, 0, DETECT_SAMPLE_SIZE))
+    if "def " in tokens and ":" in tokens and "import " in tokens:
         return "python"
-    elif "func " in code and "{" in code and "}" in code and "package " in code:
+    elif "func " in tokens and "{" in tokens and "}" in tokens and "package " in tokens:
         return "go"
-    elif "fn " in code and "let " in code and "->" in code:
+    elif "fn " in tokens and "let " in tokens and "->" in tokens:
         return "rust"
-    elif "const " in code and "function" in code and "=>" in code:
+    elif "const " in tokens and "function" in tokens and "=>" in tokens:
         return "typescript"
-    elif "function" in code and "var " in code and ";" in code:
+    elif "function" in tokens and "var " in tokens and ";" in tokens:
         return "javascript"
-    elif "class " in code and "public " in code and "void " in code:
+    elif "class " in tokens and "public " in tokens and "void " in tokens:
         return "java"
-    elif "int " in code and "#include" in code:
+    elif "int " in tokens and "#include" in tokens:
         return "c"
-    elif "std::" in code or "template<" in code:
+    elif "std::" in tokens or "template<" in tokens:
         return "cpp"
 
     # Default to Python if we can't detect
     return "python"
 
-def parse_code_to_ast(code: str, language: Optional[str] = None, filename: Optional[str] = None, include_children: bool = True) -> Dict:
+def _source_bytes(code: Union[str, bytes]) -> bytes:
+    """UTF-8 encoded source; code that is already bytes is used as is."""
+    return code if isinstance(code, bytes) else code.encode('utf-8')
+
+def _source_text(code: Union[str, bytes]) -> str:
+    """Source as text, decoding code given as UTF-8 bytes."""
+    return code.decode('utf-8') if isinstance(code, bytes) else code
+
+def resolve_language(code: Union[str, bytes], language: Optional[str] = None, filename: Optional[str] = None) -> str:
+    """Detect the language if not provided and normalize the identifier."""
+    if not language:
+        language = detect_language(code, filename)
+    return LANGUAGE_MAP.get(language.lower(), language.lower())
+
+def parse_code_to_ast(code: Union[str, bytes], language: Optional[str] = None, filename: Optional[str] = None, include_children: bool = True, include_text: bool = False, session_id: Optional[str] = None) -> Dict:
     """
     Parse code into an Abstract Syntax Tree (AST) using tree-sitter.
     
     Args:
-        code: Source code to parse
+        code: Source code to parse, as text or UTF-8 bytes
         language: Programming language identifier (optional)
         filename: Source file name (optional, used for language detection)
         include_children: Whether to include child nodes in the result
+        include_text: Whether each node carries its source text
+        session_id: Identifies a series of parses of one evolving file; each
+            parse incrementally reuses the previous tree of its session
         
     Returns:
-        Dictionary representation of the AST
+        Dictionary representation of the AST, along with the source code;
+        node text can be sliced from the UTF-8 encoded source by byte offsets
     """
     # Initialize parsers if not done already
     if not languages and not init_parsers():
         return {"error": "Tree-sitter language parsers not available. Run build_parsers.py first."}
 
-    # Detect language if not provided
-    if not language:
-        language = detect_language(code, filename)
-
-    # Normalize language identifier
-    language = LANGUAGE_MAP.get(language.lower(), language.lower())
+    # Detect and normalize the language identifier
+    language = resolve_language(code, language, filename)
 
     # Check if language is supported
     if language not in languages:
         return {"error": f"Unsupported language: {language}"}
 
     try:
-        # Create a parser and set the language
-        parser = Parser()
-        parser.language = languages[language]
-
         # Parse the code
-        source_bytes = bytes(code, 'utf-8')
-        tree = parser.parse(source_bytes)
+        source_bytes = _source_bytes(code)
+        if session_id is not None:
+            tree = _parse_in_session(source_bytes, language, session_id)
+        else:
+            tree = get_parser(language).parse(source_bytes)
 
         # Convert to dictionary
         root_node = tree.root_node
-        ast = node_to_dict(root_node, source_bytes, include_children)
+        ast = node_to_dict(root_node, source_bytes, include_children, include_text)
 
         return {
             "language": language,
-            "ast": ast
+            "ast": ast,
+            "source": _source_text(code)
         }
     except Exception as e:
         return {"error": f"Error parsing code: {e}"}
 
+def _common_prefix_length(a: bytes, b: bytes) -> int:
+    """Length of the longest common prefix of two byte strings (binary search over slice compares)."""
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def _point_at(source: bytes, offset: int) -> Tuple[int, int]:
+    """(row, column) of a byte offset, as tree-sitter counts them."""
+    row = source.count(b"\n", 0, offset)
+    return (row, offset - source.rfind(b"\n", 0, offset) - 1)
+
+def edit_tree(tree: Tree, old_source: bytes, new_source: bytes) -> None:
+    """
+    Edit a tree parsed from old_source in place to describe new_source.
+    
+    The changed region is the span between the longest common prefix and
+    suffix of the old and new source. Passing the edited tree to
+    Parser.parse lets tree-sitter only reparse around the change.
+    
+    Args:
+        tree: Tree parsed from old_source; it is modified
+        old_source: Source the tree was parsed from
+        new_source: Source about to be parsed
+    """
+    start = _common_prefix_length(old_source, new_source)
+    max_suffix = min(len(old_source), len(new_source)) - start
+    suffix = _common_prefix_length(old_source[::-1][:max_suffix], new_source[::-1][:max_suffix])
+    old_end = len(old_source) - suffix
+    new_end = len(new_source) - suffix
+    tree.edit(
+        start_byte=start,
+        old_end_byte=old_end,
+        new_end_byte=new_end,
+        start_point=_point_at(new_source, start),
+        old_end_point=_point_at(old_source, old_end),
+        new_end_point=_point_at(new_source, new_end),
+    )
+
+def _parse_in_session(source_bytes: bytes, language: str, session_id: str) -> Tree:
+    """Parse source for a session, editing and reusing the session's previous tree (see edit_tree)."""
+    previous = _session_trees.pop(session_id, None)
+    old_tree = None
+    if previous is not None and previous[0] == language:
+        _, old_source, old_tree = previous
+        edit_tree(old_tree, old_source, source_bytes)
+
+    parser = get_parser(language)
+    tree = parser.parse(source_bytes, old_tree) if old_tree is not None else parser.parse(source_bytes)
+    _session_trees[session_id] = (language, source_bytes, tree)
+    if len(_session_trees) > SESSION_TREE_CACHE_SIZE:
+        _session_trees.popitem(last=False)
+    return tree
+
+def _init_worker_parsers() -> None:
+    """Worker initializer: init_parsers with its messages sent to stderr,
+    since stdout carries the protocol when the server runs over stdio."""
+    with redirect_stdout(sys.stderr):
+        init_parsers()
+
+def _parse_source(source: Tuple[str, Optional[str], Optional[str]]) -> Dict:
+    """Worker entry point for parse_many: parse one (code, language, filename) triple."""
+    return parse_code_to_ast(*source)
+
+def parse_many(sources: List[Tuple[str, Optional[str], Optional[str]]], max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Parse several source files into ASTs, spreading them over worker processes.
+    
+    Parsing and the tree walk are CPU-bound and independent per file, so each
+    file is handled by a separate process. Each worker initializes its own
+    parsers once, since tree-sitter parsers can't be pickled.
+    
+    Args:
+        sources: (code, language, filename) triples; language and filename
+            may be None, as for parse_code_to_ast
+        max_workers: Maximum number of worker processes (default: CPU count)
+        
+    Returns:
+        List of parse_code_to_ast results, in the order of sources
+    """
+    # A single file isn't worth starting a process for
+    if len(sources) < 2:
+        return [_parse_source(source) for source in sources]
+
+    workers = min(len(sources), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_parsers) as pool:
+        return list(pool.map(_parse_source, sources))
+
+def _analyze_path(task: Tuple[str, Optional[str]]) -> Dict:
+    """Worker entry point for analyze_many: read and analyze one (path, language) pair."""
+    path, language = task
+    try:
+        with open(path, 'rb') as f:
+            code = f.read()
+    except OSError as e:
+        return {"error": f"Error reading {path}: {e}"}
+    return analyze_code_structure(code, language, path)
+
+def analyze_many(paths: List[str], language: Optional[str] = None, max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Analyze the structure of several source files, spreading them over worker processes.
+    
+    Each worker reads its files itself, so only paths and the small analysis
+    results cross process boundaries.
+    
+    Args:
+        paths: Paths of the source files to analyze
+        language: Programming language of all files (optional; detected per
+            file from its name and content if not provided)
+        max_workers: Maximum number of worker processes (default: CPU count)
+        
+    Returns:
+        List of analyze_code_structure results, in the order of paths
+    """
+    tasks = [(path, language) for path in paths]
+    # A single file isn't worth starting a process for
+    if len(tasks) < 2:
+        return [_analyze_path(task) for task in tasks]
+
+    workers = min(len(tasks), max_workers or os.cpu_count() or 1)
+    chunksize = max(1, min(32, len(tasks) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_parsers) as pool:
+        return list(pool.map(_analyze_path, tasks, chunksize=chunksize))
+
+def build_code_views(code: Union[str, bytes], language: Optional[str] = None, filename: Optional[str] = None, want=frozenset({"ast", "asg", "structure"})) -> Dict:
+    """
+    Parse code once and build the requested views of it in a single tree walk.
+    
+    Args:
+        code: Source code to parse, as text or UTF-8 bytes
+        language: Programming language identifier (optional)
+        filename: Source file name (optional, used for language detection)
+        want: Which views to build: "ast", "asg" and/or "structure"; "tree"
+            also returns the parsed tree-sitter tree
+        
+    Returns:
+        Dictionary with the language, the UTF-8 source as "source_bytes" and
+        the requested views (see node_to_all)
+    """
+    # Initialize parsers if not done already
+    if not languages and not init_parsers():
+        return {"error": "Tree-sitter language parsers not available. Run build_parsers.py first."}
+
+    # Detect and normalize the language identifier
+    language = resolve_language(code, language, filename)
+
+    # Check if language is supported
+    if language not in languages:
+        return {"error": f"Unsupported language: {language}"}
+
+    try:
+        # Parse the code
+        source_bytes = _source_bytes(code)
+        tree = get_parser(language).parse(source_bytes)
+
+        result = {"language": language, "source_bytes": source_bytes}
+        if want:
+            result.update(node_to_all(tree.root_node, source_bytes, want))
+        if "tree" in want:
+            result["tree"] = tree
+        return result
+    except Exception as e:
+        return {"error": f"Error parsing code: {e}"}
+
+def parse_code_to_all(code: Union[str, bytes], language: Optional[str] = None, filename: Optional[str] = None):
+    """
+    Parse code into its AST, ASG and structure analysis, sharing a single tree walk.
+    
+    Args:
+        code: Source code to parse, as text or UTF-8 bytes
+        language: Programming language identifier (optional)
+        filename: Source file name (optional, used for language detection)
+        
+    Returns:
+        Tuple of (AST data, ASG data, analysis) as returned by
+        parse_code_to_ast, create_asg_from_ast and analyze_code_structure;
+        all three are the error dict if parsing failed
+    """
+    language = resolve_language(code, language, filename)
+    want = {"ast", "asg", "tree", "structure"} if language == "python" else {"ast", "asg", "tree"}
+    views = build_code_views(code, language, filename, want=want)
+    if "error" in views:
+        return views, views, views
+
+    code = _source_text(code)
+    ast_data = {"language": language, "ast": views["ast"], "source": code}
+    asg = views["asg"]
+    add_semantic_edges(views["ast"], language, asg["edges"], views["source_bytes"], views["tree"])
+    asg_data = {
+        "language": language,
+        "nodes": asg["nodes"],
+        "edges": asg["edges"],
+        "root": asg["root"],
+        "source": code
+    }
+    return ast_data, asg_data, _structure_result(code, language, views.get("structure"))
+
+def _cached_view(code: str, language: Optional[str], filename: Optional[str], resource_type: str, code_hash: Optional[str] = None) -> Dict:
+    """
+    Get one view of the code ("ast", "asg" or "analysis") from the resource
+    cache, building and caching all three on a miss.
+    """
+    from .resources import get_code_hash, get_cached_resource, cache_resources
+
+    code_hash = code_hash or get_code_hash(code)
+    language = resolve_language(code, language, filename)
+    cached = get_cached_resource(code, resource_type, code_hash)
+    if cached is not None and cached.get("language") == language:
+        return cached
+
+    ast_data, asg_data, analysis = parse_code_to_all(code, language, filename)
+    if "error" in ast_data:
+        return ast_data
+    cache_resources(code, {"ast": ast_data, "asg": asg_data, "analysis": analysis}, code_hash)
+    return {"ast": ast_data, "asg": asg_data, "analysis": analysis}[resource_type]
+
 def create_asg_from_ast(ast_data: Dict) -> Dict:
     """
     Create an Abstract Semantic Graph (ASG) from an AST.
@@ -204,33 +788,45 @@ def create_asg_from_ast(ast_data: Dict) -> Dict:
         ast_data: AST data from parse_code_to_ast
         
     Returns:
-        Dictionary representation of the ASG
+        Dictionary representation of the ASG. When the AST data includes its
+        source, the ASG carries it as "source" and node text is sliced from
+        it by start_byte/end_byte (see node_text)
     """
     if "error" in ast_data:
         return ast_data
 
     ast = ast_data["ast"]
     language = ast_data["language"]
+    source_bytes = bytes(ast_data["source"], 'utf-8') if "source" in ast_data else None
+    # Nodes leave out their text when the ASG can carry the source instead;
+    # every byte of it would otherwise be copied into each of its ancestors
+    with_text = source_bytes is None
 
     # Extract nodes and edges from the AST
     nodes = []
     edges = []
 
-    def extract_nodes(node, parent_id=None):
+    # Walk the AST in preorder with an explicit stack of (node, parent_id)
+    root_id = f"{ast['type']}_{ast['start_byte']}_{ast['end_byte']}"
+    stack = [(ast, None)]
+    while stack:
+        node, parent_id = stack.pop()
         node_id = f"{node['type']}_{node['start_byte']}_{node['end_byte']}"
 
         # Add the node
-        nodes.append({
+        asg_node = {
             "id": node_id,
             "type": node["type"],
-            "text": node["text"],
             "start_byte": node["start_byte"],
             "end_byte": node["end_byte"],
             "start_line": node["start_point"]["row"],
             "start_col": node["start_point"]["column"],
             "end_line": node["end_point"]["row"],
             "end_col": node["end_point"]["column"]
-        })
+        }
+        if with_text:
+            asg_node["text"] = node["text"]
+        nodes.append(asg_node)
 
         # Add edge to parent if exists
         if parent_id:
@@ -241,116 +837,232 @@ def create_asg_from_ast(ast_data: Dict) -> Dict:
             })
 
         # Process children
-        if "children" in node:
-            for child in node["children"]:
-                extract_nodes(child, node_id)
-
-        return node_id
-
-    # Start extraction from the root
-    root_id = extract_nodes(ast)
+        for child in reversed(node.get("children", [])):
+            stack.append((child, node_id))
 
     # Add semantic edges based on language-specific rules
-    if language == "python":
-        add_python_semantic_edges(ast, edges)
-    elif language in ["javascript", "typescript"]:
-        add_js_ts_semantic_edges(ast, edges)
+    add_semantic_edges(ast, language, edges, source_bytes)
 
-    return {
+    asg = {
         "language": language,
         "nodes": nodes,
         "edges": edges,
         "root": root_id
     }
+    if not with_text:
+        asg["source"] = ast_data["source"]
+    return asg
 
-def add_python_semantic_edges(ast: Dict, edges: List[Dict]):
-    """Add Python-specific semantic edges to the ASG."""
+def add_semantic_edges(ast: Dict, language: str, edges: List[Dict], source_bytes: Optional[bytes] = None, tree: Optional[Tree] = None):
+    """
+    Add the language-specific semantic edges for an AST to the ASG edges.
+    
+    Python edges are found with a tree-sitter query when the caller has
+    the parsed tree; otherwise the dict AST is walked, which is cheaper
+    than reparsing the source just to run the query.
+    """
+    if language == "python":
+        if tree is not None:
+            add_python_semantic_edges_from_tree(tree, edges, source_bytes)
+        else:
+            add_python_semantic_edges(ast, edges, source_bytes)
+    elif language in ["javascript", "typescript"]:
+        add_js_ts_semantic_edges(ast, edges)
+
+def add_python_semantic_edges(ast: Dict, edges: List[Dict], source_bytes: Optional[bytes] = None):
+    """Add Python-specific semantic edges to the ASG (source_bytes supplies text for text-less ASTs)."""
     # This is a simplified implementation for demo purposes
     # A real implementation would do much deeper analysis
 
-    # Find all function definitions
+    # Find all function definitions. Nodes are tracked by their (type,
+    # start_byte, end_byte) keys; the string IDs are only formatted for the
+    # edges that are emitted.
     functions = {}
-    variables = {}
-
-    def find_definitions(node, scope=None):
-        if node["type"] == "function_definition":
-            # Get function name
-            for child in node.get("children", []):
+    # Scope key -> (parent scope key, {name: variable key}); functions and
+    # classes open scopes and None is the module scope
+    variables = {None: (None, {})}
+    class_scopes = set()
+    scope_types = ("function_definition", "class_definition")
+
+    # Definitions pass, each stack entry carrying its node's innermost scope
+    stack = [(ast, None)]
+    while stack:
+        node, scope = stack.pop()
+        node_type = node["type"]
+        children = node.get("children", [])
+        body_scope = scope
+
+        if node_type in scope_types:
+            for child in children:
                 if child["type"] == "identifier":
-                    func_name = child["text"]
-                    func_id = f"{node['type']}_{node['start_byte']}_{node['end_byte']}"
-                    functions[func_name] = func_id
-
-                    # New scope for this function
-                    new_scope = func_id
-
-                    # Process the function body with this new scope
-                    for body_child in node.get("children", []):
-                        if body_child["type"] == "block":
-                            find_definitions(body_child, new_scope)
+                    scope_key = node_key(node)
+                    parent = scope
+                    if node_type == "function_definition":
+                        functions[node_text(child, source_bytes)] = scope_key
+
+                        # Names in a class body aren't visible from the
+                        # methods defined in it, so their scopes skip past it
+                        while parent in class_scopes:
+                            parent = variables[parent][0]
+                    else:
+                        class_scopes.add(scope_key)
+                    variables[scope_key] = (parent, {})
+
+                    # New scope for the body
+                    body_scope = scope_key
+                    break
 
-        elif node["type"] == "assignment":
-            # Track variable assignments
-            for child in node.get("children", []):
+        elif node_type == "assignment":
+            # Track variable assignments in the innermost scope. Only the
+            # assignment target defines a name, not identifiers on the right.
+            fields = node.get("fields")
+            if fields is not None:
+                targets = [children[fields["left"]]] if "left" in fields else []
+            else:
+                targets = children
+            for child in targets:
                 if child["type"] == "identifier":
-                    var_name = child["text"]
-                    var_id = f"{child['type']}_{child['start_byte']}_{child['end_byte']}"
-
-                    # Store in current scope
-                    if scope not in variables:
-                        variables[scope] = {}
-                    variables[scope][var_name] = var_id
+                    variables[scope][1][node_text(child, source_bytes)] = node_key(child)
 
-        # Process all children
-        for child in node.get("children", []):
-            find_definitions(child, scope)
+        # Process all children in source order
+        for child in reversed(children):
+            stack.append((child, body_scope if child["type"] == "block" else scope))
 
-    # Start analysis from the root
-    find_definitions(ast)
+    # Now scan for references, resolving each name through the scope chain
+    stack = [(ast, None)]
+    while stack:
+        node, scope = stack.pop()
+        node_type = node["type"]
+        children = node.get("children", [])
+        body_scope = scope
 
-    # Now scan for references
-    def find_references(node, scope=None):
-        if node["type"] == "call":
+        if node_type == "call":
             # Check for function calls
-            for child in node.get("children", []):
+            for child in children:
                 if child["type"] == "identifier":
-                    func_name = child["text"]
+                    func_name = node_text(child, source_bytes)
                     if func_name in functions:
-                        caller_id = f"{child['type']}_{child['start_byte']}_{child['end_byte']}"
                         edges.append({
-                            "source": caller_id,
-                            "target": functions[func_name],
+                            "source": format_node_id(node_key(child)),
+                            "target": format_node_id(functions[func_name]),
                             "type": "calls"
                         })
 
-        elif node["type"] == "identifier":
-            # Check for variable references
-            var_name = node["text"]
-            var_id = f"{node['type']}_{node['start_byte']}_{node['end_byte']}"
-
-            # Check in current scope first, then parent scopes
+        elif node_type == "identifier":
+            # Check for variable references, innermost scope first
+            var_name = node_text(node, source_bytes)
             current_scope = scope
-            while current_scope is not None:
-                if current_scope in variables and var_name in variables[current_scope]:
-                    target_id = variables[current_scope][var_name]
-                    if var_id != target_id:  # Don't link to self
+            while True:
+                parent, names = variables[current_scope]
+                if var_name in names:
+                    var_key = node_key(node)
+                    target_key = names[var_name]
+                    if var_key != target_key:  # Don't link to self
                         edges.append({
-                            "source": var_id,
-                            "target": target_id,
+                            "source": format_node_id(var_key),
+                            "target": format_node_id(target_key),
                             "type": "references"
                         })
                     break
+                if current_scope is None:
+                    break
+                current_scope = parent
 
-                # Move up to parent scope
-                # This is simplistic - real implementation would track scope hierarchy
-                current_scope = None
+        elif node_type in scope_types:
+            key = node_key(node)
+            if key in variables:
+                body_scope = key
 
-        # Process all children
-        for child in node.get("children", []):
-            find_references(child, scope)
+        # Process all children in source order
+        for child in reversed(children):
+            stack.append((child, body_scope if child["type"] == "block" else scope))
 
-    # Start reference analysis from the root
-    find_references(ast)
+def add_python_semantic_edges_from_tree(tree: Tree, edges: List[Dict], source_bytes: bytes):
+    """
+    Add Python-specific semantic edges to the ASG using a tree-sitter query.
+    
+    Produces the same edges, in the same order, as add_python_semantic_edges
+    does for the tree's dict AST.
+    
+    Args:
+        tree: Parsed Python tree
+        edges: List of ASG edges to add to
+        source_bytes: Source the tree was parsed from
+    """
+    captures = QueryCursor(get_query("python", PYTHON_SEMANTIC_QUERY)).captures(tree.root_node)
+
+    # Merge the captures into source order. A scope opens where its body
+    # starts, before the first statement in it, and a call is handled before
+    # the identifier it calls, as in a preorder walk.
+    events = [(body.start_byte, 0, node) for node in captures.get("scope", ())
+              for body in (node.child_by_field_name("body"),)]
+    events += [(node.start_byte, 1, node) for node in captures.get("assignment", ())]
+    events += [(node.start_byte, 2, node) for node in captures.get("call", ())]
+    events += [(node.start_byte, 3, node) for node in captures.get("identifier", ())]
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    functions = {}
+    # Same scope table as add_python_semantic_edges
+    variables = {None: (None, {})}
+    class_scopes = set()
+
+    # Definitions, noting each event's innermost scope for the reference scan
+    scoped_events = []
+    open_scopes = []  # (scope key, body end byte)
+    for start, kind, node in events:
+        while open_scopes and start >= open_scopes[-1][1]:
+            open_scopes.pop()
+        scope = open_scopes[-1][0] if open_scopes else None
+
+        if kind == 0:
+            scope_key = (node.type, node.start_byte, node.end_byte)
+            parent = scope
+            if node.type == "function_definition":
+                name_node = node.child_by_field_name("name")
+                functions[source_bytes[name_node.start_byte:name_node.end_byte].decode('utf-8')] = scope_key
+
+                # Methods don't see the names in their class body
+                while parent in class_scopes:
+                    parent = variables[parent][0]
+            else:
+                class_scopes.add(scope_key)
+            variables[scope_key] = (parent, {})
+            open_scopes.append((scope_key, node.child_by_field_name("body").end_byte))
+            continue
+
+        name = source_bytes[start:node.end_byte].decode('utf-8')
+        if kind == 1:
+            variables[scope][1][name] = (node.type, start, node.end_byte)
+        else:
+            scoped_events.append((kind, node, name, scope))
+
+    # References, resolved innermost scope first
+    for kind, node, name, scope in scoped_events:
+        key = (node.type, node.start_byte, node.end_byte)
+        if kind == 2:
+            if name in functions:
+                edges.append({
+                    "source": format_node_id(key),
+                    "target": format_node_id(functions[name]),
+                    "type": "calls"
+                })
+            continue
+
+        current_scope = scope
+        while True:
+            parent, names = variables[current_scope]
+            if name in names:
+                target_key = names[name]
+                if key != target_key:  # Don't link to self
+                    edges.append({
+                        "source": format_node_id(key),
+                        "target": format_node_id(target_key),
+                        "type": "references"
+                    })
+                break
+            if current_scope is None:
+                break
+            current_scope = parent
 
 def add_js_ts_semantic_edges(ast: Dict, edges: List[Dict]):
     """Add JavaScript/TypeScript-specific semantic edges to the ASG."""
@@ -361,27 +1073,35 @@ def add_js_ts_semantic_edges(ast: Dict, edges: List[Dict]):
     # Since this is a demo, we're keeping it simple
     pass
 
-def analyze_code_structure(code: str, language: Optional[str] = None, filename: Optional[str] = None) -> Dict:
+def analyze_code_structure(code: Union[str, bytes], language: Optional[str] = None, filename: Optional[str] = None) -> Dict:
     """
     Analyze code structure and provide insights.
     
     Args:
-        code: Source code to analyze
+        code: Source code to analyze, as text or UTF-8 bytes
         language: Programming language identifier (optional)
         filename: Source file name (optional)
         
     Returns:
         Dictionary with code structure analysis
     """
-    # Parse code to AST
-    ast_data = parse_code_to_ast(code, language, filename)
-    if "error" in ast_data:
-        return ast_data
-
-    # Perform analysis based on the AST
-    language = ast_data["language"]
-    ast = ast_data["ast"]
-
+    # Parse the code; only Python has a structure analyzer so far, and its
+    # metrics are collected straight from the tree without a dict AST
+    language = resolve_language(code, language, filename)
+    views = build_code_views(
+        code, language, filename,
+        want={"tree"} if language == "python" else frozenset()
+    )
+    if "error" in views:
+        return views
+
+    python_structure = None
+    if views["language"] == "python":
+        python_structure = python_structure_from_tree(views["tree"].root_node, views["source_bytes"])
+    return _structure_result(_source_text(code), views["language"], python_structure)
+
+def _structure_result(code: str, language: str, python_structure: Optional[Dict]) -> Dict:
+    """Assemble the analyze_code_structure result from a language's structure summary."""
     # Collect structure information
     structure = {
         "language": language,
@@ -396,118 +1116,16 @@ def analyze_code_structure(code: str, language: Optional[str] = None, filename:
     }
 
     # Calculate metrics based on language
-    if language == "python":
-        analyze_python_structure(ast, structure)
-    elif language in ["javascript", "typescript"]:
-        analyze_js_ts_structure(ast, structure)
-    elif language == "go":
-        analyze_go_structure(ast, structure)
+    if python_structure is not None:
+        structure["functions"] = python_structure["functions"]
+        structure["classes"] = python_structure["classes"]
+        structure["imports"] = python_structure["imports"]
+        structure["complexity_metrics"]["total_nodes"] = python_structure["total_nodes"]
+        structure["complexity_metrics"]["max_nesting_level"] = python_structure["max_nesting_level"]
     # Add more language analyzers as needed
 
     return structure
 
-def analyze_python_structure(ast: Dict, structure: Dict):
-    """Analyze Python code structure."""
-    # Track functions
-    functions = []
-    classes = []
-    imports = []
-
-    def count_nodes(node):
-        count = 1  # Count this node
-        for child in node.get("children", []):
-            count += count_nodes(child)
-        return count
-
-    def find_max_nesting(node, current_depth=0):
-        max_depth = current_depth
-
-        # Increase depth for nesting structures
-        if node["type"] in ["if_statement", "for_statement", "while_statement", "try_statement", "with_statement"]:
-            current_depth += 1
-            max_depth = current_depth
-
-        # Check children
-        for child in node.get("children", []):
-            child_max = find_max_nesting(child, current_depth)
-            max_depth = max(max_depth, child_max)
-
-        return max_depth
-
-    def extract_structures(node):
-        if node["type"] == "function_definition":
-            # Extract function name
-            name = ""
-            for child in node.get("children", []):
-                if child["type"] == "identifier":
-                    name = child["text"]
-                    break
-
-            # Get function parameters
-            params = []
-            for child in node.get("children", []):
-                if child["type"] == "parameters":
-                    for param_child in child.get("children", []):
-                        if param_child["type"] == "identifier":
-                            params.append(param_child["text"])
-
-            functions.append({
-                "name": name,
-                "location": {
-                    "start_line": node["start_point"]["row"] + 1,
-                    "end_line": node["end_point"]["row"] + 1
-                },
-                "parameters": params
-            })
-
-        elif node["type"] == "class_definition":
-            # Extract class name
-            name = ""
-            for child in node.get("children", []):
-                if child["type"] == "identifier":
-                    name = child["text"]
-                    break
-
-            classes.append({
-                "name": name,
-                "location": {
-                    "start_line": node["start_point"]["row"] + 1,
-                    "end_line": node["end_point"]["row"] + 1
-                }
-            })
-
-        elif node["type"] == "import_statement" or node["type"] == "import_from_statement":
-            # Get imported module names
-            module_names = []
-            for child in node.get("children", []):
-                if child["type"] == "dotted_name":
-                    module_names.append(child["text"])
-
-            imports.append({
-                "module": ".".join(module_names),
-                "line": node["start_point"]["row"] + 1
-            })
-
-        # Process children
-        for child in node.get("children", []):
-            extract_structures(child)
-
-    # Process the AST
-    extract_structures(ast)
-
-    # Count total nodes
-    total_nodes = count_nodes(ast)
-
-    # Find maximum nesting level
-    max_nesting = find_max_nesting(ast)
-
-    # Update structure
-    structure["functions"] = functions
-    structure["classes"] = classes
-    structure["imports"] = imports
-    structure["complexity_metrics"]["total_nodes"] = total_nodes
-    structure["complexity_metrics"]["max_nesting_level"] = max_nesting
-
 def analyze_js_ts_structure(ast: Dict, structure: Dict):
     """Analyze JavaScript/TypeScript code structure."""
     # Similar implementation as the Python version but adapted for JS/TS
@@ -540,7 +1158,50 @@ def register_tools(mcp_server):
         Returns:
             A dictionary containing the AST and language information
         """
-        return parse_code_to_ast(code, language, filename)
+        return _cached_view(code, language, filename, "ast")
+
+    @mcp_server.tool()
+    def parse_incremental(code: str, session_id: str, language: Optional[str] = None, filename: Optional[str] = None) -> Dict:
+        """
+        Parse code into an AST, reusing the previous parse from the same session.
+        
+        For repeated calls on an evolving file (e.g. while it is being edited),
+        only the region that changed since the session's last call is
+        reparsed.
+        
+        Args:
+            code: The source code to parse
+            session_id: Identifier of the editing session (e.g. the file path)
+            language: The programming language (e.g., 'python', 'javascript')
+                     If not provided, the tool will attempt to detect it
+            filename: Optional filename to help with language detection
+            
+        Returns:
+            A dictionary containing the AST and language information
+        """
+        return parse_code_to_ast(code, language, filename, session_id=session_id)
+
+    @mcp_server.tool()
+    def parse_many_to_ast(files: List[Dict]) -> List[Dict]:
+        """
+        Parse several files into Abstract Syntax Trees (ASTs) in parallel.
+        
+        Args:
+            files: List of {"code": ..., "language": ..., "filename": ...} dicts;
+                   language and filename are optional, as for parse_to_ast
+            
+        Returns:
+            A list of AST results, one per file and in the same order
+        """
+        # Parse the well-formed entries; the others get an error in their place
+        valid = [i for i, f in enumerate(files) if isinstance(f, dict) and "code" in f]
+        parsed = dict(zip(valid, parse_many(
+            [(files[i]["code"], files[i].get("language"), files[i].get("filename")) for i in valid]
+        )))
+        return [
+            parsed.get(i) or {"error": "File entry has no \"code\""}
+            for i in range(len(files))
+        ]
 
     @mcp_server.tool()
     def generate_asg(code: str, language: Optional[str] = None, filename: Optional[str] = None) -> Dict:
@@ -560,8 +1221,7 @@ def register_tools(mcp_server):
         Returns:
             A dictionary containing the ASG nodes, edges, and metadata
         """
-        ast_data = parse_code_to_ast(code, language, filename)
-        return create_asg_from_ast(ast_data)
+        return _cached_view(code, language, filename, "asg")
 
     @mcp_server.tool()
     def analyze_code(code: str, language: Optional[str] = None, filename: Optional[str] = None) -> Dict:
@@ -580,7 +1240,7 @@ def register_tools(mcp_server):
         Returns:
             A dictionary with analysis results including structure and metrics
         """
-        return analyze_code_structure(code, language, filename)
+        return _cached_view(code, language, filename, "analysis")
 
     @mcp_server.tool()
     def supported_languages() -> List[str]:
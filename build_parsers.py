@@ -7,12 +7,23 @@ This script prepares the language parsers for use in the AST MCP server.
 import os
 import importlib
 import importlib.util
+import threading
+from importlib.metadata import version, PackageNotFoundError
+from concurrent.futures import ThreadPoolExecutor
 from tree_sitter import Language, Parser
 
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
 # Define the path to store parser-related files
-PARSERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ast_mcp_server/parsers")
+PARSERS_PATH = os.path.join(_HERE, "ast_mcp_server", "parsers")
 os.makedirs(PARSERS_PATH, exist_ok=True)
 
+# Lists the supported languages for the server
+PARSER_INFO_PATH = os.path.join(PARSERS_PATH, "parsers_available.txt")
+
+# Records the module versions the parsers were last tested successfully with
+TESTED_STAMP_PATH = os.path.join(PARSERS_PATH, "tested.stamp")
+
 # Define the language modules to use
 LANGUAGE_MODULES = {
     "python": "tree_sitter_python",
@@ -29,11 +40,18 @@ LANGUAGE_MODULES = {
 # "java": "tree_sitter_java",
 
 def install_missing_modules():
-    """Install any missing tree-sitter language modules."""
+    """
+    Install any missing tree-sitter language modules.
+    
+    Returns:
+        Dictionary of imported language modules by language name, or None
+        if any module is missing
+    """
+    modules = {}
     missing_modules = []
     for language, module_name in LANGUAGE_MODULES.items():
         try:
-            importlib.import_module(module_name)
+            modules[language] = importlib.import_module(module_name)
             print(f"✓ {module_name} is already installed")
         except ImportError:
             missing_modules.append(module_name)
@@ -42,19 +60,16 @@ def install_missing_modules():
         print(f"The following modules need to be installed: {', '.join(missing_modules)}")
         print("Please install them using:")
         print(f"pip install {' '.join(missing_modules)}")
-        return False
+        return None
     
-    return True
+    return modules
 
-def setup_languages():
-    """Setup tree-sitter languages and test them."""
+def setup_languages(modules):
+    """Setup tree-sitter languages from the modules install_missing_modules imported."""
     languages = {}
     
-    for lang_name, module_name in LANGUAGE_MODULES.items():
+    for lang_name, module in modules.items():
         try:
-            # Import the language module
-            module = importlib.import_module(module_name)
-            
             # Get the language object
             lang = Language(module.language())
             languages[lang_name] = lang
@@ -64,78 +79,127 @@ def setup_languages():
     
     return languages
 
+# Simple test snippet for each language
+TEST_SNIPPETS = {
+    "python": b"def hello(): print('world')",
+    "javascript": b"function hello() { console.log('world'); }",
+    "typescript": b"function hello(): string { console.log('world'); return 'hello'; }",
+    "go": b"func main() { fmt.Println(\"Hello World\") }",
+    "rust": b"fn main() { println!(\"Hello World\"); }",
+    "c": b"int main() { printf(\"Hello World\\n\"); return 0; }",
+    "cpp": b"int main() { printf(\"Hello World\\n\"); return 0; }",
+    "java": b"class Main { public static void main(String[] args) { System.out.println(\"Hello World\"); } }",
+}
+
+# One parser per worker thread, reused for every language that thread tests
+_parser_local = threading.local()
+
+def _test_parser(lang_name, language):
+    """
+    Parse the test snippet for one language.
+    
+    Returns:
+        Tuple of (root node, error message); exactly one of them is None
+    """
+    try:
+        parser = getattr(_parser_local, "parser", None)
+        if parser is None:
+            parser = _parser_local.parser = Parser()
+        parser.language = language
+        parser.reset()
+        
+        test_code = TEST_SNIPPETS.get(lang_name, b"// Test code for " + lang_name.encode())
+        
+        # Parse the code and get the AST
+        tree = parser.parse(test_code)
+        return tree.root_node, None
+    except Exception as e:
+        return None, str(e)
+
 def test_parsers(languages):
     """Test that the parsers work correctly."""
     success = True
     
-    for lang_name, language in languages.items():
-        try:
-            # Create a parser for this language
-            parser = Parser()
-            parser.language = language
-            
-            # Create a simple test snippet for each language
-            if lang_name == "python":
-                test_code = b"def hello(): print('world')"
-            elif lang_name == "javascript":
-                test_code = b"function hello() { console.log('world'); }"
-            elif lang_name == "typescript":
-                test_code = b"function hello(): string { console.log('world'); return 'hello'; }"
-            elif lang_name == "go":
-                test_code = b"func main() { fmt.Println(\"Hello World\") }"
-            elif lang_name == "rust":
-                test_code = b"fn main() { println!(\"Hello World\"); }"
-            elif lang_name in ["c", "cpp"]:
-                test_code = b"int main() { printf(\"Hello World\\n\"); return 0; }"
-            elif lang_name == "java":
-                test_code = b"class Main { public static void main(String[] args) { System.out.println(\"Hello World\"); } }"
-            else:
-                test_code = b"// Test code for " + lang_name.encode()
-            
-            # Parse the code and get the AST
-            tree = parser.parse(test_code)
-            root_node = tree.root_node
-            
-            print(f"Successfully tested {lang_name} parser")
-            print(f"  Root node type: {root_node.type}")
-            print(f"  Tree structure: {root_node}")
-            print("-" * 50)
-            
-        except Exception as e:
-            print(f"Error testing {lang_name} parser: {e}")
+    # Tree-sitter releases the GIL while parsing, so the languages are tested
+    # concurrently; results are still reported in the order of `languages`
+    with ThreadPoolExecutor(max_workers=min(len(languages), os.cpu_count() or 1) or 1) as executor:
+        futures = {
+            lang_name: executor.submit(_test_parser, lang_name, language)
+            for lang_name, language in languages.items()
+        }
+    
+    for lang_name, future in futures.items():
+        root_node, error = future.result()
+        if error is not None:
+            print(f"Error testing {lang_name} parser: {error}")
             success = False
+            continue
+        
+        print(f"Successfully tested {lang_name} parser")
+        print(f"  Root node type: {root_node.type}")
+        print(f"  Tree structure: {root_node}")
+        print("-" * 50)
     
     return success
 
+def parsers_stamp():
+    """Stamp identifying the installed tree-sitter and language module versions."""
+    lines = []
+    for module_name in ["tree_sitter", *LANGUAGE_MODULES.values()]:
+        try:
+            lines.append(f"{module_name}=={version(module_name)}")
+        except PackageNotFoundError:
+            lines.append(f"{module_name}==unknown")
+    return "\n".join(lines) + "\n"
+
+def parsers_previously_tested(stamp):
+    """Whether the parsers were already tested successfully with these module versions."""
+    try:
+        with open(TESTED_STAMP_PATH) as f:
+            return f.read() == stamp
+    except OSError:
+        return False
+
+def write_tested_stamp(stamp):
+    """Record that the parsers tested successfully with these module versions."""
+    with open(TESTED_STAMP_PATH, "w") as f:
+        f.write(stamp)
+
 def write_parser_info(languages):
     """Write parser info to a file that can be loaded by the server."""
     # Create a file to indicate parsers are available and list supported languages
-    with open(os.path.join(PARSERS_PATH, "parsers_available.txt"), "w") as f:
+    with open(PARSER_INFO_PATH, "w") as f:
         f.write("Tree-sitter language parsers are available.\n")
         f.write("LANGUAGES: " + ", ".join(languages.keys()))
 
 if __name__ == "__main__":
     try:
         print("Checking if required language modules are installed...")
-        if not install_missing_modules():
+        modules = install_missing_modules()
+        if modules is None:
             print("Please install the missing language modules and try again.")
             exit(1)
         
         print("Setting up tree-sitter languages...")
-        languages = setup_languages()
+        languages = setup_languages(modules)
         
         if not languages:
             print("No languages were loaded successfully.")
             exit(1)
         
-        print("Testing parsers...")
-        if test_parsers(languages):
-            print("All parsers tested successfully!")
-            write_parser_info(languages)
-            print("Parser setup completed!")
+        stamp = parsers_stamp()
+        if parsers_previously_tested(stamp):
+            print("Parsers were previously validated with the installed modules, skipping tests.")
         else:
-            print("Some parsers failed testing.")
-            exit(1)
+            print("Testing parsers...")
+            if not test_parsers(languages):
+                print("Some parsers failed testing.")
+                exit(1)
+            print("All parsers tested successfully!")
+            write_tested_stamp(stamp)
+        
+        write_parser_info(languages)
+        print("Parser setup completed!")
     except Exception as e:
         print(f"Error setting up parsers: {e}")
         exit(1)
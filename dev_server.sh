@@ -7,6 +7,16 @@ pkill -f "mcp dev server.py" || true
 # Current directory
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
 
+# Preload mimalloc or jemalloc when installed; tree-sitter parses are
+# allocation heavy and either is faster than the default malloc
+for lib in libmimalloc.so.2 libjemalloc.so.2; do
+    LIB_PATH=$(ldconfig -p 2>/dev/null | awk -v lib="$lib" '$1 == lib { print $NF; exit }')
+    if [ -n "$LIB_PATH" ]; then
+        export LD_PRELOAD="$LIB_PATH${LD_PRELOAD:+:$LD_PRELOAD}"
+        break
+    fi
+done
+
 # Start the server with the MCP inspector using uv
 cd "$DIR"
 uv run -m mcp dev server.py
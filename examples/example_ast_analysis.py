@@ -17,7 +17,8 @@ from ast_mcp_server.tools import (
     parse_code_to_ast,
     create_asg_from_ast,
     analyze_code_structure,
-    init_parsers
+    init_parsers,
+    node_text
 )
 
 # Example Python code to analyze
@@ -41,6 +42,9 @@ result = factorial(5)
 print(f"Factorial of 5 is {result}")
 """
 
+# The tools parse UTF-8 bytes, so encode the example once up front
+EXAMPLE_CODE_BYTES = EXAMPLE_CODE.encode("utf-8")
+
 def main():
     """Main function to demonstrate code analysis tools."""
     print("Code Analysis Example")
@@ -54,7 +58,7 @@ def main():
     
     # Parse the code to AST
     print("\n1. Parsing code to AST")
-    ast_result = parse_code_to_ast(EXAMPLE_CODE, language="python")
+    ast_result = parse_code_to_ast(EXAMPLE_CODE_BYTES, language="python")
     
     if "error" in ast_result:
         print(f"Error parsing code: {ast_result['error']}")
@@ -109,8 +113,9 @@ def main():
         # Print a few sample nodes and edges
         if asg_result['nodes']:
             print("\nSample nodes:")
+            source_bytes = asg_result['source'].encode('utf-8')
             for node in asg_result['nodes'][:3]:
-                print(f"  {node['id']} ({node['type']}): {node['text'][:30]}...")
+                print(f"  {node['id']} ({node['type']}): {node_text(node, source_bytes)[:30]}...")
         if asg_result['edges']:
             print("\nSample edges:")
             for edge in asg_result['edges'][:3]:
@@ -118,7 +123,7 @@ def main():
     
     # Analyze code structure
     print("\n3. Analyzing code structure")
-    analysis_result = analyze_code_structure(EXAMPLE_CODE, language="python")
+    analysis_result = analyze_code_structure(EXAMPLE_CODE_BYTES, language="python")
     
     if "error" in analysis_result:
         print(f"Error analyzing code: {analysis_result['error']}")
@@ -8,8 +8,10 @@ for advanced code structure queries and analysis.
 
 import os
 import sys
+import atexit
 import hashlib
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Add the parent directory to the path so we can import the tools
@@ -18,17 +20,263 @@ from ast_mcp_server.tools import (
     parse_code_to_ast,
     create_asg_from_ast,
     analyze_code_structure,
-    init_parsers
+    parse_code_to_all,
+    init_parsers,
+    node_text
 )
 
 # Try to import Neo4j driver
 try:
-    from neo4j import GraphDatabase
+    from neo4j import GraphDatabase, RoutingControl
     NEO4J_AVAILABLE = True
 except ImportError:
     NEO4J_AVAILABLE = False
     print("Warning: Neo4j driver not available. Install with 'pip install neo4j'")
 
+# Number of rows sent to Neo4j in each UNWIND query
+BATCH_SIZE = 1000
+
+# ASTs with more nodes than this are written with parallel APOC batches when
+# the server has APOC installed
+PARALLEL_MIN_NODES = 10 * BATCH_SIZE
+
+# Constraints and indexes backing the MERGE lookups of the store_* methods
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (n:ASTNode) REQUIRE (n.ast_id, n.id) IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (n:ASGNode) REQUIRE n.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (n:AST) REQUIRE n.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (n:ASG) REQUIRE n.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (n:CodeAnalysis) REQUIRE n.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Function) REQUIRE n.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Class) REQUIRE n.id IS UNIQUE",
+    "CREATE CONSTRAINT IF NOT EXISTS FOR (n:Import) REQUIRE n.id IS UNIQUE",
+    "CREATE INDEX IF NOT EXISTS FOR (f:SourceFile) ON (f.path)",
+]
+
+# Cypher statements used by AstNeo4jIntegration, kept constant so the server
+# can reuse their cached query plans
+_CYPHER = {
+    "merge_source_file": """
+        MERGE (f:SourceFile {path: $path, name: $name})
+        SET f.language = $language
+    """,
+    "merge_ast": """
+        MATCH (f:SourceFile {path: $path})
+        MERGE (ast:AST {id: $ast_id})
+        SET ast.language = $language
+        MERGE (f)-[:HAS_AST]->(ast)
+    """,
+    "delete_ast_nodes": """
+        MATCH (n:ASTNode {ast_id: $ast_id})
+        DETACH DELETE n
+    """,
+    "delete_ast_nodes_batched": """
+        CALL apoc.periodic.iterate(
+            'MATCH (n:ASTNode {ast_id: $ast_id}) RETURN n',
+            'DETACH DELETE n',
+            {batchSize: $batch_size, params: {ast_id: $ast_id}}
+        )
+        YIELD failedBatches, errorMessages
+        RETURN failedBatches, errorMessages
+    """,
+    "merge_ast_nodes": """
+        MATCH (ast:AST {id: $ast_id})
+        UNWIND range(0, size($ids) - 1) AS i
+        MERGE (n:ASTNode {ast_id: $ast_id, id: $ids[i]})
+        SET n.type = $types[i],
+            n.text = $texts[i],
+            n.start_byte = $start_bytes[i],
+            n.end_byte = $end_bytes[i],
+            n.start_line = $start_lines[i],
+            n.start_col = $start_cols[i],
+            n.end_line = $end_lines[i],
+            n.end_col = $end_cols[i]
+        MERGE (ast)-[:CONTAINS]->(n)
+        WITH n, $parents[i] AS parent_id
+        WHERE parent_id IS NOT NULL
+        MATCH (p:ASTNode {ast_id: $ast_id, id: parent_id})
+        MERGE (p)-[:HAS_CHILD]->(n)
+    """,
+    "merge_ast_nodes_parallel": """
+        CALL apoc.periodic.iterate(
+            'UNWIND range(0, size($ids) - 1) AS i RETURN i',
+            'MERGE (n:ASTNode {ast_id: $ast_id, id: $ids[i]})
+             SET n.type = $types[i],
+                 n.text = $texts[i],
+                 n.start_byte = $start_bytes[i],
+                 n.end_byte = $end_bytes[i],
+                 n.start_line = $start_lines[i],
+                 n.start_col = $start_cols[i],
+                 n.end_line = $end_lines[i],
+                 n.end_col = $end_cols[i]',
+            {batchSize: $batch_size, parallel: true, params: $columns}
+        )
+        YIELD failedBatches, errorMessages
+        RETURN failedBatches, errorMessages
+    """,
+    "merge_ast_links": """
+        MATCH (ast:AST {id: $ast_id})
+        UNWIND range(0, size($ids) - 1) AS i
+        MATCH (n:ASTNode {ast_id: $ast_id, id: $ids[i]})
+        MERGE (ast)-[:CONTAINS]->(n)
+        WITH n, $parents[i] AS parent_id
+        WHERE parent_id IS NOT NULL
+        MATCH (p:ASTNode {ast_id: $ast_id, id: parent_id})
+        MERGE (p)-[:HAS_CHILD]->(n)
+    """,
+    "apoc_available": """
+        SHOW PROCEDURES YIELD name
+        WHERE name = 'apoc.periodic.iterate'
+        RETURN count(*) > 0 AS available
+    """,
+    "merge_asg": """
+        MATCH (f:SourceFile {path: $path})
+        MERGE (asg:ASG {id: $asg_id})
+        SET asg.language = $language
+        MERGE (f)-[:HAS_ASG]->(asg)
+    """,
+    "merge_asg_nodes": """
+        MATCH (asg:ASG {id: $asg_id})
+        UNWIND $rows AS r
+        MERGE (n:ASGNode {id: r.id})
+        SET n.type = r.type,
+            n.text = r.text,
+            n.start_byte = r.start_byte,
+            n.end_byte = r.end_byte,
+            n.start_line = r.start_line,
+            n.start_col = r.start_col,
+            n.end_line = r.end_line,
+            n.end_col = r.end_col
+        MERGE (asg)-[:CONTAINS]->(n)
+    """,
+    "merge_asg_edges": """
+        UNWIND $rows AS r
+        MATCH (s:ASGNode {id: r.source})
+        MATCH (t:ASGNode {id: r.target})
+        MERGE (s)-[:EDGE {type: r.type}]->(t)
+    """,
+    "merge_asg_calls": """
+        UNWIND $rows AS r
+        MATCH (s:ASGNode {id: r.source})
+        MATCH (t:ASGNode {id: r.target})
+        MERGE (s)-[:CALLS]->(t)
+    """,
+    "merge_asg_references": """
+        UNWIND $rows AS r
+        MATCH (s:ASGNode {id: r.source})
+        MATCH (t:ASGNode {id: r.target})
+        MERGE (s)-[:REFERENCES]->(t)
+    """,
+    "merge_analysis": """
+        MATCH (f:SourceFile {path: $path})
+        MERGE (a:CodeAnalysis {id: $analysis_id})
+        SET a.language = $language,
+            a.code_length = $code_length,
+            a.max_nesting_level = $max_nesting,
+            a.total_nodes = $total_nodes
+        MERGE (f)-[:HAS_ANALYSIS]->(a)
+    """,
+    "merge_functions": """
+        MATCH (a:CodeAnalysis {id: $analysis_id})
+        UNWIND $rows AS r
+        MERGE (f:Function {id: r.id})
+        SET f.name = r.name,
+            f.start_line = r.start_line,
+            f.end_line = r.end_line,
+            f.parameters = r.parameters
+        MERGE (a)-[:HAS_FUNCTION]->(f)
+    """,
+    "merge_classes": """
+        MATCH (a:CodeAnalysis {id: $analysis_id})
+        UNWIND $rows AS r
+        MERGE (c:Class {id: r.id})
+        SET c.name = r.name,
+            c.start_line = r.start_line,
+            c.end_line = r.end_line
+        MERGE (a)-[:HAS_CLASS]->(c)
+    """,
+    "merge_imports": """
+        MATCH (a:CodeAnalysis {id: $analysis_id})
+        UNWIND $rows AS r
+        MERGE (i:Import {id: r.id})
+        SET i.module = r.module,
+            i.line = r.line
+        MERGE (a)-[:HAS_IMPORT]->(i)
+    """,
+    "find_complex_functions": """
+        MATCH (f:SourceFile)-[:HAS_ANALYSIS]->(a:CodeAnalysis)-[:HAS_FUNCTION]->(func:Function)
+        WHERE a.max_nesting_level >= $threshold
+        RETURN f.path AS file_path, func.name AS function_name, 
+               func.start_line AS start_line, func.end_line AS end_line,
+               a.max_nesting_level AS nesting_level
+        ORDER BY a.max_nesting_level DESC
+    """,
+    "find_function_calls": """
+        MATCH (caller:ASGNode)-[:CALLS]->(callee:ASGNode)
+        MATCH (f:SourceFile)-[:HAS_ASG]->(:ASG)-[:CONTAINS]->(caller)
+        RETURN f.path AS file_path, caller.text AS caller, callee.text AS callee,
+               caller.start_line AS caller_line, callee.start_line AS callee_line
+    """,
+}
+
+# Semantic ASG edge types stored as their own relationship type, so queries
+# can match them by type; other edges are stored as EDGE {type}
+_ASG_EDGE_QUERIES = {
+    "calls": "merge_asg_calls",
+    "references": "merge_asg_references",
+}
+
+# Shared drivers by (uri, user, password); each driver owns a connection pool
+_drivers = {}
+
+def _get_driver(uri, user, password):
+    """Get the process-wide Neo4j driver for these connection settings."""
+    key = (uri, user, password)
+    driver = _drivers.get(key)
+    if driver is None:
+        driver = _drivers[key] = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=int(os.getenv("NEO4J_POOL_SIZE", "50")),
+            connection_acquisition_timeout=30
+        )
+    return driver
+
+def close_drivers():
+    """Close all shared Neo4j drivers."""
+    while _drivers:
+        _, driver = _drivers.popitem()
+        driver.close()
+
+atexit.register(close_drivers)
+
+def _chunks(rows, size=BATCH_SIZE):
+    """Split a list of rows into consecutive batches of at most `size` rows."""
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def _hid(*parts):
+    """128-bit hex ID derived from the given parts."""
+    return hashlib.blake2b(
+        b"\0".join(str(part).encode("utf-8") for part in parts), digest_size=16
+    ).hexdigest()
+
+def _column_batches(columns, size=BATCH_SIZE):
+    """Split equal-length columns into consecutive batches of at most `size` rows."""
+    length = len(next(iter(columns.values()), ()))
+    for start in range(0, length, size):
+        yield {name: column[start:start + size] for name, column in columns.items()}
+
+def _parse_file(path):
+    """Worker entry point for store_files: read one file and build its AST, ASG and analysis."""
+    try:
+        with open(path, 'rb') as f:
+            code = f.read()
+    except OSError as e:
+        error = {"error": f"Error reading {path}: {e}"}
+        return error, None, None
+    return parse_code_to_all(code, filename=path)
+
 class AstNeo4jIntegration:
     """Integration class for AST/ASG analysis with Neo4j."""
     
@@ -39,26 +287,89 @@ class AstNeo4jIntegration:
         self.password = password
         self.db = db
         self.driver = None
+        self.apoc_available = False
+        # Paths whose SourceFile node has been merged by this integration
+        self._file_nodes_merged = set()
         
         if NEO4J_AVAILABLE:
             try:
-                self.driver = GraphDatabase.driver(uri, auth=(user, password))
+                self.driver = _get_driver(uri, user, password)
                 # Test connection
-                with self.driver.session(database=db) as session:
-                    result = session.run("RETURN 1 AS test")
-                    test_value = result.single()["test"]
-                    if test_value == 1:
-                        print(f"✅ Connected to Neo4j at {uri}")
-                    else:
-                        print(f"❌ Connection test failed")
+                records, _, _ = self.driver.execute_query(
+                    "RETURN 1 AS test", database_=db, routing_=RoutingControl.READ
+                )
+                test_value = records[0]["test"]
+                if test_value == 1:
+                    print(f"✅ Connected to Neo4j at {uri}")
+                else:
+                    print(f"❌ Connection test failed")
+                self._ensure_schema()
+                self.apoc_available = self._probe_apoc()
             except Exception as e:
                 print(f"❌ Failed to connect to Neo4j: {e}")
         else:
             print("⚠️ Neo4j integration disabled (driver not available)")
     
+    def _ensure_schema(self):
+        """Create the constraints and indexes the store_* MERGEs look nodes up by."""
+        for statement in SCHEMA_STATEMENTS:
+            self.driver.execute_query(statement, database_=self.db, routing_=RoutingControl.WRITE)
+    
+    def _probe_apoc(self):
+        """Check whether the server provides apoc.periodic.iterate."""
+        try:
+            records, _, _ = self.driver.execute_query(
+                _CYPHER["apoc_available"], database_=self.db, routing_=RoutingControl.READ
+            )
+            return bool(records and records[0]["available"])
+        except Exception:
+            return False
+    
+    def _ensure_source_file(self, tx, path, name, language):
+        """MERGE the SourceFile node for `path` unless this integration already has."""
+        if path in self._file_nodes_merged:
+            return
+        tx.run(_CYPHER["merge_source_file"], path=path, name=name, language=language)
+        self._file_nodes_merged.add(path)
+    
+    def _execute_write(self, writes, file_path):
+        """
+        Run writes for one file in a managed write transaction.
+        
+        The driver retries the transaction on transient errors (deadlocks,
+        leader changes), so everything written through `tx` is stored
+        completely or not at all. The exception is the nodes of large ASTs
+        that _prepare_ast writes through APOC beforehand: those are committed
+        already and stay behind, unlinked, if this transaction fails.
+        
+        Args:
+            writes: List of (kind, data, write) tuples; each write(tx, data, file_path)
+                returns the ID of what it stored
+            file_path: Path to the source file
+            
+        Returns:
+            Dictionary mapping each kind to the returned ID
+        """
+        merged = file_path in self._file_nodes_merged
+        
+        def work(tx):
+            # A retried attempt redoes the SourceFile MERGE of a rolled-back one
+            if not merged:
+                self._file_nodes_merged.discard(file_path)
+            return {kind: write(tx, data, file_path) for kind, data, write in writes}
+        
+        try:
+            with self.driver.session(database=self.db) as session:
+                return session.execute_write(work)
+        except Exception:
+            # The SourceFile MERGE was rolled back with the transaction
+            self._file_nodes_merged.discard(file_path)
+            raise
+    
     def store_ast_in_neo4j(self, ast_data, file_path):
         """
-        Store AST data in Neo4j for querying.
+        Store AST data in Neo4j for querying, replacing the AST previously
+        stored for the same file and language.
         
         Args:
             ast_data: AST result from parse_code_to_ast
@@ -71,92 +382,160 @@ class AstNeo4jIntegration:
             print(f"⚠️ Cannot store AST with error: {ast_data['error']}")
             return None
         
-        # Generate a unique ID for this AST
-        file_name = os.path.basename(file_path)
-        ast_id = hashlib.md5(f"{file_path}:{ast_data['language']}".encode()).hexdigest()
-        
-        # Create statements
-        with self.driver.session(database=self.db) as session:
-            # Create file node
-            session.run(
-                """
-                MERGE (f:SourceFile {path: $path, name: $name})
-                SET f.language = $language
-                RETURN f
-                """,
-                path=file_path,
-                name=file_name,
-                language=ast_data["language"]
-            )
-            
-            # Create AST node
-            session.run(
-                """
-                MATCH (f:SourceFile {path: $path})
-                MERGE (ast:AST {id: $ast_id})
-                SET ast.language = $language
-                MERGE (f)-[:HAS_AST]->(ast)
-                RETURN ast
-                """,
-                path=file_path,
+        ast_data = self._prepare_ast(ast_data, file_path)
+        ast_id = self._execute_write([("ast", ast_data, self._write_ast)], file_path)["ast"]
+        
+        print(f"✅ Stored AST in Neo4j with ID: {ast_id}")
+        return ast_id
+    
+    def _prepare_ast(self, ast_data, file_path):
+        """
+        Flatten an AST for _write_ast, writing the nodes of large ASTs ahead
+        of the file's transaction.
+        
+        Large ASTs on servers with APOC have their nodes deleted and merged
+        by parallel APOC batches. Those commit in their own transactions, so
+        they run here, before the file's transaction has locked anything
+        they touch; _write_ast then only links the nodes. If the file's
+        transaction fails, the new nodes stay behind unlinked and the old
+        ones are gone until the file is stored again.
+        
+        Returns:
+            The AST's language, ID and node columns, and whether its nodes
+            were already written
+        """
+        ast_id = _hid(file_path, ast_data["language"])
+        
+        # Node text is sliced from the source
+        source_bytes = ast_data.get("source", "").encode("utf-8")
+        columns = self._flatten_ast(ast_data["ast"], source_bytes)
+        parallel = self.apoc_available and len(columns["ids"]) > PARALLEL_MIN_NODES
+        
+        if parallel:
+            # Node IDs are pre-order positions, so a changed file reuses the
+            # IDs of its previous version; clear that version first (see
+            # _write_ast). Node IDs are unique, so the parallel batches never
+            # write the same node.
+            self.driver.execute_query(
+                _CYPHER["delete_ast_nodes_batched"],
                 ast_id=ast_id,
-                language=ast_data["language"]
+                batch_size=BATCH_SIZE,
+                database_=self.db,
+                routing_=RoutingControl.WRITE
             )
-            
-            # Store AST nodes recursively
-            self._add_ast_node_to_neo4j(session, ast_id, None, ast_data["ast"])
-            
-            print(f"✅ Stored AST in Neo4j with ID: {ast_id}")
-            return ast_id
-    
-    def _add_ast_node_to_neo4j(self, session, ast_id, parent_id, node):
-        """Add an AST node to Neo4j recursively."""
-        # Generate a unique ID for this node
-        node_id = f"{ast_id}_{node['type']}_{node['start_byte']}_{node['end_byte']}"
-        
-        # Create the node
-        session.run(
-            """
-            MATCH (ast:AST {id: $ast_id})
-            MERGE (n:ASTNode {id: $node_id})
-            SET n.type = $type,
-                n.text = $text,
-                n.start_byte = $start_byte,
-                n.end_byte = $end_byte,
-                n.start_line = $start_line,
-                n.start_col = $start_col,
-                n.end_line = $end_line,
-                n.end_col = $end_col
-            MERGE (ast)-[:CONTAINS]->(n)
-            """,
+            node_columns = {name: column for name, column in columns.items() if name != "parents"}
+            node_columns["ast_id"] = ast_id
+            self.driver.execute_query(
+                _CYPHER["merge_ast_nodes_parallel"],
+                columns=node_columns,
+                batch_size=BATCH_SIZE,
+                database_=self.db,
+                routing_=RoutingControl.WRITE
+            )
+        
+        return {
+            "language": ast_data["language"],
+            "ast_id": ast_id,
+            "columns": columns,
+            "nodes_written": parallel
+        }
+    
+    def _write_ast(self, tx, prepared, file_path):
+        """Write an AST prepared by _prepare_ast within the transaction `tx` and return its ID."""
+        file_name = os.path.basename(file_path)
+        ast_id = prepared["ast_id"]
+        columns = prepared["columns"]
+        
+        # Create file node if not exists
+        self._ensure_source_file(tx, file_path, file_name, prepared["language"])
+        
+        # Create AST node
+        tx.run(
+            _CYPHER["merge_ast"],
+            path=file_path,
             ast_id=ast_id,
-            node_id=node_id,
-            type=node["type"],
-            text=node["text"],
-            start_byte=node["start_byte"],
-            end_byte=node["end_byte"],
-            start_line=node["start_point"]["row"],
-            start_col=node["start_point"]["column"],
-            end_line=node["end_point"]["row"],
-            end_col=node["end_point"]["column"]
+            language=prepared["language"]
         )
         
-        # Link to parent if exists
-        if parent_id:
-            session.run(
-                """
-                MATCH (p:ASTNode {id: $parent_id})
-                MATCH (n:ASTNode {id: $node_id})
-                MERGE (p)-[:HAS_CHILD]->(n)
-                """,
-                parent_id=parent_id,
-                node_id=node_id
+        if prepared["nodes_written"]:
+            # The nodes were merged by _prepare_ast. The edges are merged in
+            # this transaction, single-threaded, since edges sharing a parent
+            # would contend for its lock.
+            link_columns = {"ids": columns["ids"], "parents": columns["parents"]}
+            for batch in _column_batches(link_columns):
+                tx.run(
+                    _CYPHER["merge_ast_links"],
+                    ast_id=ast_id,
+                    **batch
+                )
+        else:
+            # Node IDs are pre-order positions, so a changed file reuses the
+            # IDs of its previous version; clear that version's nodes and
+            # edges first, or its HAS_CHILD edges would mix with the new tree's
+            tx.run(_CYPHER["delete_ast_nodes"], ast_id=ast_id)
+            
+            # Nodes come parents first, so each node's parent was merged by an
+            # earlier row and its HAS_CHILD edge is merged along with it
+            for batch in _column_batches(columns):
+                tx.run(
+                    _CYPHER["merge_ast_nodes"],
+                    ast_id=ast_id,
+                    **batch
+                )
+        
+        return ast_id
+    
+    def _flatten_ast(self, root, source_bytes):
+        """
+        Flatten an AST into parallel columns of node properties.
+        
+        Nodes are listed in pre-order, so every parent precedes its children
+        and the root comes first. A node's ID is its pre-order position,
+        unique within its AST (ASTNodes are keyed on ast_id and id). Only leaf nodes carry their text; an inner
+        node's text is the concatenation of its leaves' (plus whitespace),
+        so repeating it on every ancestor would store the source many times.
+        
+        Returns:
+            Dictionary of equal-length lists, keyed by query parameter name
+        """
+        columns = {
+            name: [] for name in (
+                "ids", "parents", "types", "texts", "start_bytes", "end_bytes",
+                "start_lines", "start_cols", "end_lines", "end_cols"
             )
+        }
+        ids = columns["ids"]
+        parents = columns["parents"]
+        types = columns["types"]
+        texts = columns["texts"]
+        start_bytes = columns["start_bytes"]
+        end_bytes = columns["end_bytes"]
+        start_lines = columns["start_lines"]
+        start_cols = columns["start_cols"]
+        end_lines = columns["end_lines"]
+        end_cols = columns["end_cols"]
+        
+        stack = [(None, root)]
+        while stack:
+            parent_id, node = stack.pop()
+            node_id = len(ids)
+            ids.append(node_id)
+            parents.append(parent_id)
+            types.append(node["type"])
+            children = node.get("children")
+            texts.append(None if children else node_text(node, source_bytes))
+            start_bytes.append(node["start_byte"])
+            end_bytes.append(node["end_byte"])
+            start_lines.append(node["start_point"]["row"])
+            start_cols.append(node["start_point"]["column"])
+            end_lines.append(node["end_point"]["row"])
+            end_cols.append(node["end_point"]["column"])
+            
+            # Push children in reverse so they are visited in order
+            if children:
+                stack.extend((node_id, child) for child in reversed(children))
         
-        # Process children
-        if "children" in node:
-            for child in node["children"]:
-                self._add_ast_node_to_neo4j(session, ast_id, node_id, child)
+        return columns
     
     def store_asg_in_neo4j(self, asg_data, file_path):
         """
@@ -173,79 +552,64 @@ class AstNeo4jIntegration:
             print(f"⚠️ Cannot store ASG with error: {asg_data['error']}")
             return None
         
+        asg_id = self._execute_write([("asg", asg_data, self._write_asg)], file_path)["asg"]
+        
+        print(f"✅ Stored ASG in Neo4j with ID: {asg_id}")
+        return asg_id
+    
+    def _write_asg(self, tx, asg_data, file_path):
+        """Write the ASG of one file within the transaction `tx` and return its ID."""
         # Generate a unique ID for this ASG
         file_name = os.path.basename(file_path)
-        asg_id = hashlib.md5(f"{file_path}:{asg_data['language']}:asg".encode()).hexdigest()
-        
-        with self.driver.session(database=self.db) as session:
-            # Create file node if not exists
-            session.run(
-                """
-                MERGE (f:SourceFile {path: $path, name: $name})
-                SET f.language = $language
-                RETURN f
-                """,
-                path=file_path,
-                name=file_name,
-                language=asg_data["language"]
-            )
-            
-            # Create ASG node
-            session.run(
-                """
-                MATCH (f:SourceFile {path: $path})
-                MERGE (asg:ASG {id: $asg_id})
-                SET asg.language = $language
-                MERGE (f)-[:HAS_ASG]->(asg)
-                """,
-                path=file_path,
+        asg_id = _hid(file_path, asg_data["language"], "asg")
+        
+        # Create file node if not exists
+        self._ensure_source_file(tx, file_path, file_name, asg_data["language"])
+        
+        # Create ASG node
+        tx.run(
+            _CYPHER["merge_asg"],
+            path=file_path,
+            asg_id=asg_id,
+            language=asg_data["language"]
+        )
+        
+        # Add nodes in batches; their text is sliced from the source
+        source_bytes = asg_data.get("source", "").encode("utf-8")
+        node_rows = [
+            {
+                "id": node["id"],
+                "type": node["type"],
+                "text": node_text(node, source_bytes),
+                "start_byte": node.get("start_byte", 0),
+                "end_byte": node.get("end_byte", 0),
+                "start_line": node.get("start_line", 0),
+                "start_col": node.get("start_col", 0),
+                "end_line": node.get("end_line", 0),
+                "end_col": node.get("end_col", 0)
+            }
+            for node in asg_data["nodes"]
+        ]
+        for batch in _chunks(node_rows):
+            tx.run(
+                _CYPHER["merge_asg_nodes"],
                 asg_id=asg_id,
-                language=asg_data["language"]
+                rows=batch
             )
-            
-            # Add nodes
-            for node in asg_data["nodes"]:
-                session.run(
-                    """
-                    MATCH (asg:ASG {id: $asg_id})
-                    MERGE (n:ASGNode {id: $node_id})
-                    SET n.type = $type,
-                        n.text = $text,
-                        n.start_byte = $start_byte,
-                        n.end_byte = $end_byte,
-                        n.start_line = $start_line,
-                        n.start_col = $start_col,
-                        n.end_line = $end_line,
-                        n.end_col = $end_col
-                    MERGE (asg)-[:CONTAINS]->(n)
-                    """,
-                    asg_id=asg_id,
-                    node_id=node["id"],
-                    type=node["type"],
-                    text=node["text"],
-                    start_byte=node.get("start_byte", 0),
-                    end_byte=node.get("end_byte", 0),
-                    start_line=node.get("start_line", 0),
-                    start_col=node.get("start_col", 0),
-                    end_line=node.get("end_line", 0),
-                    end_col=node.get("end_col", 0)
-                )
-            
-            # Add edges
-            for edge in asg_data["edges"]:
-                session.run(
-                    """
-                    MATCH (s:ASGNode {id: $source_id})
-                    MATCH (t:ASGNode {id: $target_id})
-                    MERGE (s)-[r:EDGE {type: $edge_type}]->(t)
-                    """,
-                    source_id=edge["source"],
-                    target_id=edge["target"],
-                    edge_type=edge["type"]
+        
+        # Add edges in batches, one statement per relationship type
+        edges_by_query = {}
+        for edge in asg_data["edges"]:
+            query = _ASG_EDGE_QUERIES.get(edge["type"], "merge_asg_edges")
+            edges_by_query.setdefault(query, []).append(edge)
+        for query, edges in edges_by_query.items():
+            for batch in _chunks(edges):
+                tx.run(
+                    _CYPHER[query],
+                    rows=batch
                 )
-            
-            print(f"✅ Stored ASG in Neo4j with ID: {asg_id}")
-            return asg_id
+        
+        return asg_id
     
     def store_analysis_in_neo4j(self, analysis_data, file_path):
         """
@@ -262,141 +626,169 @@ class AstNeo4jIntegration:
             print(f"⚠️ Cannot store analysis with error: {analysis_data['error']}")
             return None
         
+        analysis_id = self._execute_write([("analysis", analysis_data, self._write_analysis)], file_path)["analysis"]
+        
+        print(f"✅ Stored code analysis in Neo4j with ID: {analysis_id}")
+        return analysis_id
+    
+    def _write_analysis(self, tx, analysis_data, file_path):
+        """Write the code analysis of one file within the transaction `tx` and return its ID."""
         # Generate a unique ID for the analysis
         file_name = os.path.basename(file_path)
-        analysis_id = hashlib.md5(f"{file_path}:{analysis_data['language']}:analysis".encode()).hexdigest()
-        
-        with self.driver.session(database=self.db) as session:
-            # Create file node if not exists
-            session.run(
-                """
-                MERGE (f:SourceFile {path: $path, name: $name})
-                SET f.language = $language
-                RETURN f
-                """,
-                path=file_path,
-                name=file_name,
-                language=analysis_data["language"]
-            )
-            
-            # Create CodeAnalysis node
-            session.run(
-                """
-                MATCH (f:SourceFile {path: $path})
-                MERGE (a:CodeAnalysis {id: $analysis_id})
-                SET a.language = $language,
-                    a.code_length = $code_length,
-                    a.max_nesting_level = $max_nesting,
-                    a.total_nodes = $total_nodes
-                MERGE (f)-[:HAS_ANALYSIS]->(a)
-                """,
-                path=file_path,
-                analysis_id=analysis_id,
-                language=analysis_data["language"],
-                code_length=analysis_data["code_length"],
-                max_nesting=analysis_data["complexity_metrics"]["max_nesting_level"],
-                total_nodes=analysis_data["complexity_metrics"]["total_nodes"]
-            )
-            
-            # Add functions
-            for func in analysis_data["functions"]:
-                func_id = hashlib.md5(f"{analysis_id}:func:{func['name']}:{func['location']['start_line']}".encode()).hexdigest()
-                session.run(
-                    """
-                    MATCH (a:CodeAnalysis {id: $analysis_id})
-                    MERGE (f:Function {id: $func_id})
-                    SET f.name = $name,
-                        f.start_line = $start_line,
-                        f.end_line = $end_line,
-                        f.parameters = $parameters
-                    MERGE (a)-[:HAS_FUNCTION]->(f)
-                    """,
-                    analysis_id=analysis_id,
-                    func_id=func_id,
-                    name=func["name"],
-                    start_line=func["location"]["start_line"],
-                    end_line=func["location"]["end_line"],
-                    parameters=func["parameters"]
-                )
-            
-            # Add classes
-            for cls in analysis_data["classes"]:
-                cls_id = hashlib.md5(f"{analysis_id}:class:{cls['name']}:{cls['location']['start_line']}".encode()).hexdigest()
-                session.run(
-                    """
-                    MATCH (a:CodeAnalysis {id: $analysis_id})
-                    MERGE (c:Class {id: $cls_id})
-                    SET c.name = $name,
-                        c.start_line = $start_line,
-                        c.end_line = $end_line
-                    MERGE (a)-[:HAS_CLASS]->(c)
-                    """,
+        analysis_id = _hid(file_path, analysis_data["language"], "analysis")
+        
+        # Create file node if not exists
+        self._ensure_source_file(tx, file_path, file_name, analysis_data["language"])
+        
+        # Create CodeAnalysis node
+        tx.run(
+            _CYPHER["merge_analysis"],
+            path=file_path,
+            analysis_id=analysis_id,
+            language=analysis_data["language"],
+            code_length=analysis_data["code_length"],
+            max_nesting=analysis_data["complexity_metrics"]["max_nesting_level"],
+            total_nodes=analysis_data["complexity_metrics"]["total_nodes"]
+        )
+        
+        # Add functions, classes and imports in batches
+        function_rows = [
+            {
+                "id": _hid(analysis_id, "func", func["name"], func["location"]["start_line"]),
+                "name": func["name"],
+                "start_line": func["location"]["start_line"],
+                "end_line": func["location"]["end_line"],
+                "parameters": func["parameters"]
+            }
+            for func in analysis_data["functions"]
+        ]
+        class_rows = [
+            {
+                "id": _hid(analysis_id, "class", cls["name"], cls["location"]["start_line"]),
+                "name": cls["name"],
+                "start_line": cls["location"]["start_line"],
+                "end_line": cls["location"]["end_line"]
+            }
+            for cls in analysis_data["classes"]
+        ]
+        import_rows = [
+            {
+                "id": _hid(analysis_id, "import", imp["module"], imp["line"]),
+                "module": imp["module"],
+                "line": imp["line"]
+            }
+            for imp in analysis_data["imports"]
+        ]
+        for query, rows in (
+            ("merge_functions", function_rows),
+            ("merge_classes", class_rows),
+            ("merge_imports", import_rows),
+        ):
+            for batch in _chunks(rows):
+                tx.run(
+                    _CYPHER[query],
                     analysis_id=analysis_id,
-                    cls_id=cls_id,
-                    name=cls["name"],
-                    start_line=cls["location"]["start_line"],
-                    end_line=cls["location"]["end_line"]
+                    rows=batch
                 )
+        
+        return analysis_id
+    
+    def store_all(self, ast_data, asg_data, analysis_data, file_path):
+        """
+        Store the AST, ASG and analysis of one file in a single transaction.
+        
+        Args:
+            ast_data: AST result from parse_code_to_ast (or None to skip it)
+            asg_data: ASG result from create_asg_from_ast (or None to skip it)
+            analysis_data: Analysis result from analyze_code_structure (or None to skip it)
+            file_path: Path to the source file
             
-            # Add imports
-            for imp in analysis_data["imports"]:
-                imp_id = hashlib.md5(f"{analysis_id}:import:{imp['module']}:{imp['line']}".encode()).hexdigest()
-                session.run(
-                    """
-                    MATCH (a:CodeAnalysis {id: $analysis_id})
-                    MERGE (i:Import {id: $imp_id})
-                    SET i.module = $module,
-                        i.line = $line
-                    MERGE (a)-[:HAS_IMPORT]->(i)
-                    """,
-                    analysis_id=analysis_id,
-                    imp_id=imp_id,
-                    module=imp["module"],
-                    line=imp["line"]
-                )
+        Returns:
+            Dictionary with the IDs of the stored "ast", "asg" and "analysis"
+        """
+        if not NEO4J_AVAILABLE or not self.driver:
+            return None
+        
+        writes = []
+        for kind, data, write in (
+            ("ast", ast_data, self._write_ast),
+            ("asg", asg_data, self._write_asg),
+            ("analysis", analysis_data, self._write_analysis),
+        ):
+            if data is None:
+                continue
+            if "error" in data:
+                print(f"⚠️ Cannot store {kind} with error: {data['error']}")
+                continue
+            if kind == "ast":
+                data = self._prepare_ast(data, file_path)
+            writes.append((kind, data, write))
+        ids = self._execute_write(writes, file_path)
+        
+        print(f"✅ Stored {', '.join(ids) or 'nothing'} for {file_path} in Neo4j")
+        return ids
+    
+    def store_files(self, paths, max_workers=None):
+        """
+        Parse and store several source files.
+        
+        Worker processes parse the files while this process writes the ones
+        already parsed, so parsing and Neo4j writes overlap.
+        
+        Args:
+            paths: Paths of the source files to store
+            max_workers: Maximum number of parser processes (default: CPU count)
             
-            print(f"✅ Stored code analysis in Neo4j with ID: {analysis_id}")
-            return analysis_id
+        Returns:
+            Dictionary mapping each path to the IDs returned by store_all
+        """
+        if not NEO4J_AVAILABLE or not self.driver:
+            return {}
+        
+        # Both map and zip iterate the paths, so a generator must be listed first
+        paths = list(paths)
+        results = {}
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_parsers) as pool:
+            # map submits every file up front and yields the parses in order
+            for path, views in zip(paths, pool.map(_parse_file, paths)):
+                results[path] = self.store_all(*views, path)
+        return results
     
     def find_complex_functions(self, nesting_threshold=3):
         """Find functions with high nesting levels."""
         if not NEO4J_AVAILABLE or not self.driver:
             return []
         
-        with self.driver.session(database=self.db) as session:
-            result = session.run(
-                """
-                MATCH (f:SourceFile)-[:HAS_ANALYSIS]->(a:CodeAnalysis)-[:HAS_FUNCTION]->(func:Function)
-                WHERE a.max_nesting_level >= $threshold
-                RETURN f.path AS file_path, func.name AS function_name, 
-                       func.start_line AS start_line, func.end_line AS end_line,
-                       a.max_nesting_level AS nesting_level
-                ORDER BY a.max_nesting_level DESC
-                """,
-                threshold=nesting_threshold
-            )
-            return [dict(record) for record in result]
+        records, _, _ = self.driver.execute_query(
+            _CYPHER["find_complex_functions"],
+            threshold=nesting_threshold,
+            database_=self.db,
+            routing_=RoutingControl.READ
+        )
+        return [dict(record) for record in records]
     
     def find_function_calls(self):
         """Find function call relationships."""
         if not NEO4J_AVAILABLE or not self.driver:
             return []
         
-        with self.driver.session(database=self.db) as session:
-            result = session.run(
-                """
-                MATCH (f:SourceFile)-[:HAS_ASG]->(asg:ASG)-[:CONTAINS]->(caller:ASGNode)
-                MATCH (caller)-[r:EDGE {type: 'calls'}]->(callee:ASGNode)
-                RETURN f.path AS file_path, caller.text AS caller, callee.text AS callee,
-                       caller.start_line AS caller_line, callee.start_line AS callee_line
-                """
-            )
-            return [dict(record) for record in result]
+        records, _, _ = self.driver.execute_query(
+            _CYPHER["find_function_calls"],
+            database_=self.db,
+            routing_=RoutingControl.READ
+        )
+        return [dict(record) for record in records]
     
     def close(self):
-        """Close the Neo4j connection."""
-        if self.driver:
-            self.driver.close()
+        """
+        Release the Neo4j connection.
+        
+        The driver is shared by every integration with the same connection
+        settings and stays open; close_drivers closes it, which also happens
+        at exit.
+        """
+        self.driver = None
+        self._file_nodes_merged.clear()
 
 
 def main():
@@ -492,18 +884,20 @@ print(f"Factorial of 5 is {result}")
     print("""
     // Find recursive functions
     MATCH (f:SourceFile)-[:HAS_ASG]->(asg:ASG)-[:CONTAINS]->(func:ASGNode)
-    MATCH p = (func)-[:EDGE*]->(func)
+    MATCH p = (func)-[:EDGE|CALLS|REFERENCES*]->(func)
     WHERE func.type = 'function_definition'
     RETURN DISTINCT f.path AS file, func.text AS function
     
     // Find unused imports
+    // (only leaf ASTNodes store text, so match the imported identifiers)
     MATCH (f:SourceFile)-[:HAS_AST]->(ast:AST)-[:CONTAINS]->(imp:ASTNode)
     WHERE imp.type = 'import_statement'
-    OPTIONAL MATCH (f)-[:HAS_ASG]->(asg:ASG)-[:CONTAINS]->(ref:ASGNode)-[:EDGE {type: 'references'}]->()
-    WHERE ref.text CONTAINS imp.text
-    WITH f, imp, COUNT(ref) AS usage_count
+    MATCH (imp)-[:HAS_CHILD*]->(name:ASTNode {type: 'identifier'})
+    OPTIONAL MATCH (f)-[:HAS_ASG]->(asg:ASG)-[:CONTAINS]->(ref:ASGNode)-[:REFERENCES]->()
+    WHERE ref.text = name.text
+    WITH f, imp, name, COUNT(ref) AS usage_count
     WHERE usage_count = 0
-    RETURN f.path AS file, imp.text AS unused_import, imp.start_line AS line
+    RETURN f.path AS file, name.text AS unused_import, imp.start_line AS line
     
     // Find code complexity metrics
     MATCH (f:SourceFile)-[:HAS_ANALYSIS]->(a:CodeAnalysis)
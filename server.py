@@ -8,21 +8,26 @@ and reason about code. It includes enhanced features for improved scope handling
 incremental parsing, and performance optimizations for large codebases.
 """
 
-import os
 import sys
-import json
 import hashlib
 import tempfile
+from collections import OrderedDict
 from mcp.server.fastmcp import FastMCP
 from typing import Dict, List, Optional, Tuple
 
 # Import our tools and resources
-from ast_mcp_server.tools import register_tools
-from ast_mcp_server.resources import register_resources, cache_resource, get_code_hash, CACHE_DIR
+from ast_mcp_server.tools import register_tools, init_parsers, resolve_language, _cached_view
+from ast_mcp_server.resources import (
+    register_resources, cache_resource, cache_ast_source, get_code_hash, get_cache_path, track_cache_file,
+    cache_file_exists, has_cached_resource, load_resource
+)
 
 # Import our enhanced tools if they exist
 try:
-    from ast_mcp_server.enhanced_tools import register_enhanced_tools
+    from ast_mcp_server.enhanced_tools import (
+        register_enhanced_tools, parse_code_to_ast_incremental, create_enhanced_asg_from_ast,
+        save_enhanced_asg, load_enhanced_asg, diff_ast_parallel
+    )
     ENHANCED_TOOLS_AVAILABLE = True
 except ImportError:
     ENHANCED_TOOLS_AVAILABLE = False
@@ -40,12 +45,32 @@ if ENHANCED_TOOLS_AVAILABLE:
 # Register resources with the server
 register_resources(mcp)
 
-# Cache for storing previous ASTs for incremental parsing
-AST_CACHE = {}
+# Previous source and tree per code_id (or code hash) for incremental
+# parsing, least recently used first
+AST_CACHE_SIZE = 256
+AST_CACHE: "OrderedDict[str, Dict]" = OrderedDict()
 
 # Add custom handlers for tool operations
 # These ensure that results are cached for resource access
 
+def _tool_result(key: str, data: Dict, code_hash: str, scheme: Optional[str] = None, **extra) -> Dict:
+    """
+    Wrap a cached tool result with its resource URI, passing errors through.
+    
+    Args:
+        key: Key for the data in the result, and the URI scheme unless scheme is given
+        data: Result data, or an error dictionary
+        code_hash: Hash the data is cached under
+        scheme: URI scheme of the resource (optional)
+        **extra: Additional entries for the result
+        
+    Returns:
+        The error dictionary, or the data with its resource URI and extra entries
+    """
+    if "error" in data:
+        return data
+    return {key: data, "resource_uri": f"{scheme or key}://{code_hash}", **extra}
+
 @mcp.tool()
 def parse_and_cache(code: str, language: Optional[str] = None, filename: Optional[str] = None) -> Dict:
     """
@@ -63,25 +88,14 @@ def parse_and_cache(code: str, language: Optional[str] = None, filename: Optiona
     Returns:
         Dictionary with AST data and resource URI
     """
-    from ast_mcp_server.tools import parse_code_to_ast
-    
     # Generate a hash for the code
     code_hash = get_code_hash(code)
     
-    # Parse the code to AST
-    ast_data = parse_code_to_ast(code, language, filename)
+    # Reuse the cached AST, or parse and cache the AST, ASG and analysis
+    ast_data = _cached_view(code, language, filename, "ast", code_hash)
     
-    # Cache the result
-    if "error" not in ast_data:
-        cache_resource(code, "ast", ast_data)
-        
-        # Return the AST with a resource URI
-        return {
-            "ast": ast_data,
-            "resource_uri": f"ast://{code_hash}"
-        }
-    else:
-        return ast_data
+    # Return the AST with a resource URI
+    return _tool_result("ast", ast_data, code_hash)
 
 @mcp.tool()
 def generate_and_cache_asg(code: str, language: Optional[str] = None, filename: Optional[str] = None) -> Dict:
@@ -100,29 +114,14 @@ def generate_and_cache_asg(code: str, language: Optional[str] = None, filename:
     Returns:
         Dictionary with ASG data and resource URI
     """
-    from ast_mcp_server.tools import parse_code_to_ast, create_asg_from_ast
-    
     # Generate a hash for the code
     code_hash = get_code_hash(code)
     
-    # Parse to AST first
-    ast_data = parse_code_to_ast(code, language, filename)
-    
-    if "error" in ast_data:
-        return ast_data
-    
-    # Generate ASG
-    asg_data = create_asg_from_ast(ast_data)
-    
-    # Cache both results
-    cache_resource(code, "ast", ast_data)
-    cache_resource(code, "asg", asg_data)
+    # Reuse the cached ASG, or parse and cache the AST, ASG and analysis
+    asg_data = _cached_view(code, language, filename, "asg", code_hash)
     
     # Return the ASG with a resource URI
-    return {
-        "asg": asg_data,
-        "resource_uri": f"asg://{code_hash}"
-    }
+    return _tool_result("asg", asg_data, code_hash)
 
 @mcp.tool()
 def analyze_and_cache(code: str, language: Optional[str] = None, filename: Optional[str] = None) -> Dict:
@@ -141,25 +140,14 @@ def analyze_and_cache(code: str, language: Optional[str] = None, filename: Optio
     Returns:
         Dictionary with analysis data and resource URI
     """
-    from ast_mcp_server.tools import analyze_code_structure
-    
     # Generate a hash for the code
     code_hash = get_code_hash(code)
     
-    # Analyze the code
-    analysis_data = analyze_code_structure(code, language, filename)
+    # Reuse the cached analysis, or parse and cache the AST, ASG and analysis
+    analysis_data = _cached_view(code, language, filename, "analysis", code_hash)
     
-    # Cache the result
-    if "error" not in analysis_data:
-        cache_resource(code, "analysis", analysis_data)
-        
-        # Return the analysis with a resource URI
-        return {
-            "analysis": analysis_data,
-            "resource_uri": f"analysis://{code_hash}"
-        }
-    else:
-        return analysis_data
+    # Return the analysis with a resource URI
+    return _tool_result("analysis", analysis_data, code_hash)
 
 # Enhanced tools from server_enhanced.py
 if ENHANCED_TOOLS_AVAILABLE:
@@ -186,41 +174,54 @@ if ENHANCED_TOOLS_AVAILABLE:
         Returns:
             Dictionary with AST data and resource URI
         """
-        from ast_mcp_server.enhanced_tools import parse_code_to_ast_incremental
+        # Encode once: these bytes are hashed and parsed now, and kept as the
+        # old source of the next incremental parse
+        source_bytes = code.encode('utf-8')
         
         # Generate a hash for the code
-        code_hash = get_code_hash(code)
+        code_hash = get_code_hash(source_bytes)
+        language = resolve_language(source_bytes, language, filename)
         
         # Use file path as cache key if provided, otherwise use hash
         cache_key = code_id if code_id else code_hash
         
         # Check if we have a previous version in cache
-        old_code = None
-        if cache_key in AST_CACHE:
-            old_code = AST_CACHE["code"]
+        old_source = None
+        previous_tree = None
+        previous = AST_CACHE.pop(cache_key, None)
+        if previous is not None and previous["language"] == language:
+            if previous["hash"] == code_hash:
+                # Unchanged code: return the previous result without parsing
+                AST_CACHE[cache_key] = previous
+                return _tool_result("ast", previous["ast_data"], code_hash, incremental=True)
+            old_source = previous["source"]
+            previous_tree = previous["tree"]
         
         # Parse the code to AST, potentially using incremental parsing
-        ast_data = parse_code_to_ast_incremental(code, language, filename)
-        
-        # Cache the current code for future incremental parsing
-        AST_CACHE[cache_key] = {
-            "code": code,
-            "ast_data": ast_data,
-            "language": ast_data.get("language")
-        }
+        ast_data = parse_code_to_ast_incremental(
+            source_bytes, language, filename, previous_tree=previous_tree, old_code=old_source
+        )
         
         # Cache the result for resource access
         if "error" not in ast_data:
-            cache_resource(code, "ast", ast_data)
-            
-            # Return the AST with a resource URI
-            return {
-                "ast": ast_data,
-                "resource_uri": f"ast://{code_hash}",
-                "incremental": old_code is not None
+            # Keep the source bytes and tree for the next incremental parse;
+            # the native tree can't be returned to the client
+            AST_CACHE[cache_key] = {
+                "source": source_bytes,
+                "hash": code_hash,
+                "tree": ast_data.pop("tree_object"),
+                "language": ast_data["language"],
+                "ast_data": ast_data
             }
-        else:
-            return ast_data
+            if len(AST_CACHE) > AST_CACHE_SIZE:
+                AST_CACHE.popitem(last=False)
+            
+            # The returned AST carries node text; ast:// is rebuilt from the
+            # source in the usual shape instead
+            cache_ast_source(code, ast_data["language"], code_hash)
+        
+        # Return the AST with a resource URI
+        return _tool_result("ast", ast_data, code_hash, incremental=old_source is not None)
 
     @mcp.tool()
     def generate_and_cache_enhanced_asg(
@@ -243,13 +244,24 @@ if ENHANCED_TOOLS_AVAILABLE:
         Returns:
             Dictionary with enhanced ASG data and resource URI
         """
-        from ast_mcp_server.enhanced_tools import parse_code_to_ast_incremental, create_enhanced_asg_from_ast
-        
         # Generate a hash for the code
         code_hash = get_code_hash(code)
+        cache_path = get_cache_path(code_hash, "enhanced_asg", "json")
         
-        # Parse to AST first
-        ast_data = parse_code_to_ast_incremental(code, language, filename)
+        # Return the cached ASG if this code was analyzed before
+        if cache_file_exists(cache_path):
+            try:
+                asg_data = load_enhanced_asg(cache_path)
+            except (OSError, ValueError):
+                asg_data = None
+            if asg_data is not None and asg_data.get("language") == resolve_language(code, language, filename):
+                return _tool_result("asg", asg_data, code_hash, "enhanced_asg")
+        
+        # Parse to AST first. The ASG is built from the native tree, so the
+        # nested dict AST isn't needed
+        ast_data = parse_code_to_ast_incremental(
+            code, language, filename, include_children=False
+        )
         
         if "error" in ast_data:
             return ast_data
@@ -257,15 +269,17 @@ if ENHANCED_TOOLS_AVAILABLE:
         # Generate enhanced ASG
         asg_data = create_enhanced_asg_from_ast(ast_data)
         
-        # Cache both results
-        cache_resource(code, "ast", ast_data)
-        cache_resource(code, "enhanced_asg", asg_data)
+        # Cache both results; ast:// is rebuilt from the source
+        if not has_cached_resource(code_hash, "ast"):
+            cache_ast_source(code, ast_data["language"], code_hash)
+        try:
+            save_enhanced_asg(asg_data, cache_path)
+            track_cache_file(cache_path)
+        except Exception as e:
+            print(f"Error caching resource: {e}")
         
         # Return the ASG with a resource URI
-        return {
-            "asg": asg_data,
-            "resource_uri": f"enhanced_asg://{code_hash}"
-        }
+        return _tool_result("asg", asg_data, code_hash, "enhanced_asg")
 
     @mcp.tool()
     def ast_diff_and_cache(
@@ -289,29 +303,32 @@ if ENHANCED_TOOLS_AVAILABLE:
         Returns:
             Dictionary with diff data and resource URIs
         """
-        from ast_mcp_server.enhanced_tools import diff_ast
-        
         # Generate hashes for both code versions
         old_hash = get_code_hash(old_code)
         new_hash = get_code_hash(new_code)
-        
-        # Generate the diff
-        diff_data = diff_ast(old_code, new_code, language, filename)
-        
-        if "error" in diff_data:
-            return diff_data
-        
-        # Cache the diff
-        diff_hash = get_code_hash(f"{old_hash}_{new_hash}")
-        cache_resource(f"{old_hash}_{new_hash}", "diff", diff_data)
+        diff_key = f"{old_hash}_{new_hash}"
+        diff_hash = get_code_hash(diff_key)
+        
+        # Reuse the cached diff if these two versions were compared before
+        try:
+            diff_data = load_resource(diff_hash, "diff")
+        except Exception:
+            diff_data = None
+        if diff_data is None or diff_data.get("language") != resolve_language(new_code, language, filename):
+            # Generate the diff
+            diff_data = diff_ast_parallel(old_code, new_code, language, filename)
+            
+            if "error" in diff_data:
+                return diff_data
+            
+            # Cache the diff
+            cache_resource(diff_key, "diff", diff_data, diff_hash)
         
         # Return the diff with a resource URI
-        return {
-            "diff": diff_data,
-            "resource_uri": f"diff://{diff_hash}",
-            "old_uri": f"ast://{old_hash}",
-            "new_uri": f"ast://{new_hash}"
-        }
+        return _tool_result(
+            "diff", diff_data, diff_hash,
+            old_uri=f"ast://{old_hash}", new_uri=f"ast://{new_hash}"
+        )
         
     # Register enhanced resources
     @mcp.resource("diff://{diff_hash}")
@@ -327,14 +344,13 @@ if ENHANCED_TOOLS_AVAILABLE:
         Returns:
             The cached diff data
         """
-        cache_path = os.path.join(CACHE_DIR, f"{diff_hash}_diff.json")
+        try:
+            diff_data = load_resource(diff_hash, "diff")
+        except Exception as e:
+            return {"error": f"Error reading cached diff: {e}"}
         
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
-                return {"error": f"Error reading cached diff: {e}"}
+        if diff_data is not None:
+            return diff_data
         
         return {"error": "Diff not found. Please use ast_diff_and_cache tool first."}
 
@@ -351,15 +367,12 @@ if ENHANCED_TOOLS_AVAILABLE:
         Returns:
             The cached enhanced ASG data
         """
-        from ast_mcp_server.resources import get_cache_path
+        cache_path = get_cache_path(code_hash, "enhanced_asg", "json")
         
-        cache_path = get_cache_path(code_hash, "enhanced_asg")
-        
-        if os.path.exists(cache_path):
+        if cache_file_exists(cache_path):
             try:
-                with open(cache_path, 'r') as f:
-                    return json.load(f)
-            except Exception as e:
+                return load_enhanced_asg(cache_path)
+            except (OSError, ValueError) as e:
                 return {"error": f"Error reading cached enhanced ASG: {e}"}
         
         return {"error": "Enhanced ASG not found. Please use generate_and_cache_enhanced_asg tool first."}
@@ -368,8 +381,6 @@ if __name__ == "__main__":
     print("Starting server initialization...")
     
     # Check if tree-sitter parsers are available
-    from ast_mcp_server.tools import init_parsers
-    
     print("Checking for tree-sitter parsers...")
     if not init_parsers():
         print("WARNING: Tree-sitter language parsers not found.")
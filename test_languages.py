@@ -5,6 +5,33 @@ import tree_sitter_python
 import tree_sitter_javascript
 from tree_sitter import Language, Parser
 
+def print_children(node):
+    """Print the direct children of a node by walking them with a tree cursor."""
+    print("Children:")
+    cursor = node.walk()
+    if not cursor.goto_first_child():
+        return
+    i = 0
+    while True:
+        print(f"Child {i}: {cursor.node.type}")
+        i += 1
+        if not cursor.goto_next_sibling():
+            break
+
+def print_tree(tree):
+    """Print every node type in the tree, indented by depth, walking it with a tree cursor."""
+    cursor = tree.walk()
+    depth = 0
+    while True:
+        print(f"{'  ' * depth}{cursor.node.type}")
+        if cursor.goto_first_child():
+            depth += 1
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return
+            depth -= 1
+
 # Test Python
 print("Setting up Python language...")
 python_language = Language(tree_sitter_python.language())
@@ -20,15 +47,11 @@ def hello():
 python_tree = python_parser.parse(python_code)
 print("Python parsing successful!")
 print(f"Root node type: {python_tree.root_node.type}")
-# Check what attributes are available on nodes
-print("Node attributes:")
-print(dir(python_tree.root_node))
-# Print the tree structure using the string representation
-print(f"Node representation: {python_tree.root_node}")
+# Print the tree structure
+print("Tree:")
+print_tree(python_tree)
 # Print children
-print("Children:")
-for i, child in enumerate(python_tree.root_node.children):
-    print(f"Child {i}: {child.type}")
+print_children(python_tree.root_node)
 print("-" * 50)
 
 # Test JavaScript
@@ -48,6 +71,4 @@ js_tree = js_parser.parse(js_code)
 print("JavaScript parsing successful!")
 print(f"Root node type: {js_tree.root_node.type}")
 # Print children
-print("Children:")
-for i, child in enumerate(js_tree.root_node.children):
-    print(f"Child {i}: {child.type}")
+print_children(js_tree.root_node)
@@ -4,6 +4,20 @@
 import tree_sitter_languages
 from tree_sitter import Parser
 
+def walk_types(tree):
+    """Yield (depth, type) for every node in the tree, in pre-order, using a tree cursor."""
+    cursor = tree.walk()
+    depth = 0
+    while True:
+        yield depth, cursor.node.type
+        if cursor.goto_first_child():
+            depth += 1
+            continue
+        while not cursor.goto_next_sibling():
+            if not cursor.goto_parent():
+                return
+            depth -= 1
+
 # Test a simple Python code snippet
 code = b"""
 def hello():
@@ -16,7 +30,9 @@ tree = parser.parse(code)
 root = tree.root_node
 
 print(f"Python root node type: {root.type}")
-print(f"S-expression: {root.sexp()}")
+print("Tree:")
+for depth, node_type in walk_types(tree):
+    print(f"{'  ' * depth}{node_type}")
 
 # Alternative way using get_language and Parser
 python_lang = tree_sitter_languages.get_language('python')